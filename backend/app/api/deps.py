@@ -2,15 +2,18 @@ from collections.abc import Generator
 from typing import Annotated
 
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError
 from sqlmodel import Session
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
+from app.core.db import engine, replicas
+from app.core.deadlines import get_deadline, set_timeouts, timeout_error
+from app.core.replicas import RoutingSession, sticky_clients
 from app.models import TokenPayload, User
 
 reusable_oauth2 = OAuth2PasswordBearer(
@@ -18,9 +21,28 @@ reusable_oauth2 = OAuth2PasswordBearer(
 )
 
 
-def get_db() -> Generator[Session, None, None]:
-    with Session(engine) as session:
-        yield session
+def get_db(request: Request) -> Generator[Session, None, None]:
+    deadline = get_deadline(request)
+    read = request.method in ("GET", "HEAD")
+    if not replicas:
+        session = Session(engine)
+    else:
+        # Reads go to the replicas, except for the clients that just wrote
+        sticky_key = request.headers.get("Authorization")
+        session = RoutingSession(
+            engine,
+            replicas=replicas,
+            read_only=read and not (sticky_key and sticky_key in sticky_clients),
+            sticky_key=sticky_key,
+        )
+    with session:
+        set_timeouts(session, deadline, write=not read)
+        try:
+            yield session
+        except DBAPIError as e:
+            if error := timeout_error(e):
+                raise error from e
+            raise
 
 
 SessionDep = Annotated[Session, Depends(get_db)]
@@ -49,6 +71,12 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
+def require_emails_enabled() -> None:
+    # The emails queued in the outbox are only sent with an SMTP server
+    if not settings.emails_enabled:
+        raise HTTPException(status_code=503, detail="Emails are not enabled")
+
+
 def get_current_active_superuser(current_user: CurrentUser) -> User:
     if not current_user.is_superuser:
         raise HTTPException(
@@ -1,44 +1,88 @@
+import base64
+import binascii
 import uuid
-from typing import Any
+from typing import Annotated, Any
 
-from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query
 
+from app import crud
 from app.api.deps import CurrentUser, SessionDep
-from app.models import Item, ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message
+from app.core.deadlines import latency_budget
+from app.models import (
+    Item,
+    ItemCreate,
+    ItemPublic,
+    ItemsFilter,
+    ItemsPublic,
+    ItemsSearchPublic,
+    ItemUpdate,
+    Message,
+)
 
 router = APIRouter(prefix="/items", tags=["items"])
 
 
 @router.get("/", response_model=ItemsPublic)
+@latency_budget(3_000)
 def read_items(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    session: SessionDep,
+    current_user: CurrentUser,
+    filters: Annotated[ItemsFilter, Depends()],
+    skip: int = 0,
+    limit: int = 100,
 ) -> Any:
     """
     Retrieve items.
     """
+    if not current_user.is_superuser:
+        if filters.owner_id and filters.owner_id != current_user.id:
+            raise HTTPException(status_code=400, detail="Not enough permissions")
+        filters = filters.model_copy(update={"owner_id": current_user.id})
+    items, count = crud.get_items(
+        session=session, filters=filters, skip=skip, limit=limit
+    )
+    return ItemsPublic(data=items, count=count)
 
-    if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Item)
-        count = session.exec(count_statement).one()
-        statement = select(Item).offset(skip).limit(limit)
-        items = session.exec(statement).all()
-    else:
-        count_statement = (
-            select(func.count())
-            .select_from(Item)
-            .where(Item.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Item)
-            .where(Item.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-        )
-        items = session.exec(statement).all()
 
-    return ItemsPublic(data=items, count=count)
+def encode_cursor(rank: float, id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(f"{rank!r},{id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, uuid.UUID]:
+    try:
+        rank, id = base64.urlsafe_b64decode(cursor).decode().split(",")
+        return float(rank), uuid.UUID(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/search", response_model=ItemsSearchPublic)
+@latency_budget(2_000)
+def search_items(
+    session: SessionDep,
+    current_user: CurrentUser,
+    q: Annotated[str, Query(min_length=1, max_length=255)],
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 100,
+) -> Any:
+    """
+    Search items by the words of their title and description, best matches
+    first.
+    """
+    results = crud.search_items(
+        session=session,
+        query=q,
+        owner_id=None if current_user.is_superuser else current_user.id,
+        after=decode_cursor(cursor) if cursor else None,
+        limit=limit,
+    )
+    next_cursor = None
+    if results and len(results) == limit:
+        last_item, last_rank = results[-1]
+        next_cursor = encode_cursor(last_rank, last_item.id)
+    return ItemsSearchPublic(
+        data=[item for item, _ in results], next_cursor=next_cursor
+    )
 
 
 @router.get("/{id}", response_model=ItemPublic)
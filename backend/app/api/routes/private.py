@@ -1,10 +1,11 @@
 from typing import Any
 
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from app.api.deps import SessionDep
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash, run_password_hashing
 from app.models import (
     User,
     UserPublic,
@@ -21,18 +22,22 @@ class PrivateUserCreate(BaseModel):
 
 
 @router.post("/users/", response_model=UserPublic)
-def create_user(user_in: PrivateUserCreate, session: SessionDep) -> Any:
+async def create_user(user_in: PrivateUserCreate, session: SessionDep) -> Any:
     """
     Create a new user.
     """
+    hashed_password = await run_password_hashing(get_password_hash, user_in.password)
 
-    user = User(
-        email=user_in.email,
-        full_name=user_in.full_name,
-        hashed_password=get_password_hash(user_in.password),
-    )
+    def save() -> UserPublic:
+        user = User(
+            email=user_in.email,
+            full_name=user_in.full_name,
+            hashed_password=hashed_password,
+        )
 
-    session.add(user)
-    session.commit()
+        session.add(user)
+        session.commit()
 
-    return user
+        return UserPublic.model_validate(user)
+
+    return await run_in_threadpool(save)
@@ -1,7 +1,8 @@
 import uuid
-from typing import Any
+from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import col, delete, func, select
 
 from app import crud
@@ -11,7 +12,13 @@ from app.api.deps import (
     get_current_active_superuser,
 )
 from app.core.config import settings
-from app.core.security import get_password_hash, verify_password
+from app.core.deadlines import latency_budget
+from app.core.security import (
+    get_password_hash,
+    get_password_hashes,
+    run_password_hashing,
+    verify_password,
+)
 from app.models import (
     Item,
     Message,
@@ -20,11 +27,14 @@ from app.models import (
     UserCreate,
     UserPublic,
     UserRegister,
+    UsersImport,
+    UsersImportPublic,
     UsersPublic,
+    UsersSearchPublic,
     UserUpdate,
     UserUpdateMe,
 )
-from app.utils import generate_new_account_email, send_email
+from app.utils import generate_new_account_email, generate_new_account_emails
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -34,6 +44,7 @@ router = APIRouter(prefix="/users", tags=["users"])
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
+@latency_budget(3_000)
 def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
     """
     Retrieve users.
@@ -48,31 +59,96 @@ def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
     return UsersPublic(data=users, count=count)
 
 
+@router.get(
+    "/search",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=UsersSearchPublic,
+)
+@latency_budget(1_000)
+def search_users(
+    session: SessionDep,
+    q: Annotated[str, Query(min_length=1, max_length=255)],
+    limit: Annotated[int, Query(ge=1, le=20)] = 10,
+) -> Any:
+    """
+    Find users by the start of their email or full name, for type-ahead.
+    """
+    users = crud.search_users(session=session, query=q, limit=limit)
+    return UsersSearchPublic(data=users)
+
+
 @router.post(
     "/", dependencies=[Depends(get_current_active_superuser)], response_model=UserPublic
 )
-def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
+async def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
     """
     Create new user.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
-    if user:
-        raise HTTPException(
-            status_code=400,
-            detail="The user with this email already exists in the system.",
-        )
+    # Hashed in the threads for blocking work, the one of the route is only
+    # taken for the queries
+    hashed_password = await run_password_hashing(get_password_hash, user_in.password)
 
-    user = crud.create_user(session=session, user_create=user_in)
-    if settings.emails_enabled and user_in.email:
-        email_data = generate_new_account_email(
-            email_to=user_in.email, username=user_in.email, password=user_in.password
+    def save() -> UserPublic:
+        user = crud.get_user_by_email(session=session, email=user_in.email)
+        if user:
+            raise HTTPException(
+                status_code=400,
+                detail="The user with this email already exists in the system.",
+            )
+
+        user = crud.create_user(
+            session=session, user_create=user_in, hashed_password=hashed_password
         )
-        send_email(
-            email_to=user_in.email,
-            subject=email_data.subject,
-            html_content=email_data.html_content,
+        if settings.emails_enabled and user_in.email:
+            email_data = generate_new_account_email(
+                email_to=user_in.email,
+                username=user_in.email,
+                password=user_in.password,
+            )
+            crud.enqueue_email(
+                session=session,
+                email_to=user_in.email,
+                subject=email_data.subject,
+                html_content=email_data.html_content,
+            )
+        return UserPublic.model_validate(user)
+
+    return await run_in_threadpool(save)
+
+
+@router.post(
+    "/import",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=UsersImportPublic,
+)
+@latency_budget(60_000)
+async def import_users(*, session: SessionDep, users_import: UsersImport) -> Any:
+    """
+    Create many users at once, skipping the emails already registered.
+    """
+    # End the transaction of the authentication, so that no connection is
+    # held while the passwords are hashed, one after the other in a thread for
+    # blocking work
+    await run_in_threadpool(session.commit)
+    hashed_passwords = await run_password_hashing(
+        get_password_hashes,
+        [user_create.password for user_create in users_import.users],
+    )
+
+    def save() -> UsersImportPublic:
+        created, skipped = crud.create_users(
+            session=session,
+            users_create=users_import.users,
+            hashed_passwords=hashed_passwords,
         )
-    return user
+        if settings.emails_enabled and users_import.send_emails and created:
+            emails = generate_new_account_emails(
+                users_import.users, [user.email for user in created]
+            )
+            crud.enqueue_emails(session=session, emails=emails)
+        return UsersImportPublic(created=created, skipped=skipped)
+
+    return await run_in_threadpool(save)
 
 
 @router.patch("/me", response_model=UserPublic)
@@ -98,22 +174,28 @@ def update_user_me(
 
 
 @router.patch("/me/password", response_model=Message)
-def update_password_me(
+async def update_password_me(
     *, session: SessionDep, body: UpdatePassword, current_user: CurrentUser
 ) -> Any:
     """
     Update own password.
     """
-    if not verify_password(body.current_password, current_user.hashed_password):
+    if not await run_password_hashing(
+        verify_password, body.current_password, current_user.hashed_password
+    ):
         raise HTTPException(status_code=400, detail="Incorrect password")
     if body.current_password == body.new_password:
         raise HTTPException(
             status_code=400, detail="New password cannot be the same as the current one"
         )
-    hashed_password = get_password_hash(body.new_password)
-    current_user.hashed_password = hashed_password
-    session.add(current_user)
-    session.commit()
+    hashed_password = await run_password_hashing(get_password_hash, body.new_password)
+
+    def save() -> None:
+        current_user.hashed_password = hashed_password
+        session.add(current_user)
+        session.commit()
+
+    await run_in_threadpool(save)
     return Message(message="Password updated successfully")
 
 
@@ -142,19 +224,27 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
 
 
 @router.post("/signup", response_model=UserPublic)
-def register_user(session: SessionDep, user_in: UserRegister) -> Any:
+async def register_user(session: SessionDep, user_in: UserRegister) -> Any:
     """
     Create new user without the need to be logged in.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
-    if user:
-        raise HTTPException(
-            status_code=400,
-            detail="The user with this email already exists in the system",
+    # Hashed before the first query, in the threads for blocking work
+    hashed_password = await run_password_hashing(get_password_hash, user_in.password)
+
+    def save() -> UserPublic:
+        user = crud.get_user_by_email(session=session, email=user_in.email)
+        if user:
+            raise HTTPException(
+                status_code=400,
+                detail="The user with this email already exists in the system",
+            )
+        user_create = UserCreate.model_validate(user_in)
+        user = crud.create_user(
+            session=session, user_create=user_create, hashed_password=hashed_password
         )
-    user_create = UserCreate.model_validate(user_in)
-    user = crud.create_user(session=session, user_create=user_create)
-    return user
+        return UserPublic.model_validate(user)
+
+    return await run_in_threadpool(save)
 
 
 @router.get("/{user_id}", response_model=UserPublic)
@@ -180,7 +270,7 @@ def read_user_by_id(
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UserPublic,
 )
-def update_user(
+async def update_user(
     *,
     session: SessionDep,
     user_id: uuid.UUID,
@@ -189,22 +279,35 @@ def update_user(
     """
     Update a user.
     """
-
-    db_user = session.get(User, user_id)
-    if not db_user:
-        raise HTTPException(
-            status_code=404,
-            detail="The user with this id does not exist in the system",
+    hashed_password = None
+    if user_in.password:
+        hashed_password = await run_password_hashing(
+            get_password_hash, user_in.password
         )
-    if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
-        if existing_user and existing_user.id != user_id:
+
+    def save() -> UserPublic:
+        db_user = session.get(User, user_id)
+        if not db_user:
             raise HTTPException(
-                status_code=409, detail="User with this email already exists"
+                status_code=404,
+                detail="The user with this id does not exist in the system",
             )
+        if user_in.email:
+            existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+            if existing_user and existing_user.id != user_id:
+                raise HTTPException(
+                    status_code=409, detail="User with this email already exists"
+                )
+
+        db_user = crud.update_user(
+            session=session,
+            db_user=db_user,
+            user_in=user_in,
+            hashed_password=hashed_password,
+        )
+        return UserPublic.model_validate(db_user)
 
-    db_user = crud.update_user(session=session, db_user=db_user, user_in=user_in)
-    return db_user
+    return await run_in_threadpool(save)
 
 
 @router.delete("/{user_id}", dependencies=[Depends(get_current_active_superuser)])
@@ -1,24 +1,44 @@
-from fastapi import APIRouter, Depends
+import uuid
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic.networks import EmailStr
 
-from app.api.deps import get_current_active_superuser
-from app.models import Message
-from app.utils import generate_test_email, send_email
+from app import crud
+from app.api.deps import (
+    SessionDep,
+    get_current_active_superuser,
+    require_emails_enabled,
+)
+from app.core.health import readiness_probe
+from app.models import (
+    EmailBroadcast,
+    EmailBroadcastCreate,
+    EmailBroadcastPublic,
+    HealthCheck,
+    Message,
+)
+from app.utils import generate_test_email
 
 router = APIRouter(prefix="/utils", tags=["utils"])
 
 
 @router.post(
     "/test-email/",
-    dependencies=[Depends(get_current_active_superuser)],
+    dependencies=[
+        Depends(get_current_active_superuser),
+        Depends(require_emails_enabled),
+    ],
     status_code=201,
 )
-def test_email(email_to: EmailStr) -> Message:
+def test_email(email_to: EmailStr, session: SessionDep) -> Message:
     """
     Test emails.
     """
     email_data = generate_test_email(email_to=email_to)
-    send_email(
+    crud.enqueue_email(
+        session=session,
         email_to=email_to,
         subject=email_data.subject,
         html_content=email_data.html_content,
@@ -26,6 +46,65 @@ def test_email(email_to: EmailStr) -> Message:
     return Message(message="Test email sent")
 
 
+@router.post(
+    "/broadcast-email/",
+    dependencies=[
+        Depends(get_current_active_superuser),
+        Depends(require_emails_enabled),
+    ],
+    response_model=EmailBroadcastPublic,
+    status_code=201,
+)
+def broadcast_email(session: SessionDep, broadcast_in: EmailBroadcastCreate) -> Any:
+    """
+    Send an email to all the active users, in the background.
+    """
+    return crud.create_email_broadcast(session=session, broadcast_in=broadcast_in)
+
+
+@router.get(
+    "/broadcast-email/{id}",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=EmailBroadcastPublic,
+)
+def read_email_broadcast(session: SessionDep, id: uuid.UUID) -> Any:
+    """
+    Get the progress of an email broadcast.
+    """
+    broadcast = session.get(EmailBroadcast, id)
+    if not broadcast:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return broadcast
+
+
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get("/health/live/", response_model=HealthCheck)
+async def liveness() -> Any:
+    """
+    The worker is running, its dependencies aren't checked.
+    """
+    return HealthCheck(status="ok")
+
+
+@router.get(
+    "/health/ready/",
+    response_model=HealthCheck,
+    responses={503: {"model": HealthCheck}},
+)
+async def readiness(request: Request, response: Response) -> Any:
+    """
+    The worker can take requests: it has started and its database answers.
+    Degraded dependencies are reported without making it unavailable.
+    """
+    result: HealthCheck | None
+    if not getattr(request.app.state, "ready", False):
+        result = HealthCheck(status="unavailable", checks={"worker": "starting"})
+    elif not (result := readiness_probe.cached()):
+        result = await run_in_threadpool(readiness_probe.check)
+    if result.status == "unavailable":
+        response.status_code = 503
+    return result
@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import httpx
+from sqlmodel import Session, col, delete, select
+
+from app.core.config import settings
+from app.core.db import engine, init_db
+from app.core.security import get_password_hash
+from app.models import Item, User
+
+# All the users created by the load test have emails with this prefix, so
+# that they can be removed afterwards
+EMAIL_PREFIX = "bench-"
+PASSWORD = "benchmark-password"
+
+
+def bench_email(name: str, *, prefix: str = EMAIL_PREFIX) -> str:
+    return f"{prefix}{name}@example.com"
+
+
+def seed_dataset(*, session: Session, users: int, items_per_user: int) -> list[str]:
+    """
+    Create the users (and their items) missing from the dataset, returning
+    the emails of all of them.
+    """
+    emails = [bench_email(f"user-{i}") for i in range(users)]
+    existing = set(
+        session.exec(select(User.email).where(col(User.email).in_(emails))).all()
+    )
+    # Hashed once, the same password is used by all the users
+    hashed_password = get_password_hash(PASSWORD)
+    for email in emails:
+        if email in existing:
+            continue
+        user = User(email=email, hashed_password=hashed_password)
+        session.add(user)
+        session.add_all(
+            Item(title=f"Item {i}", description="Load test", owner_id=user.id)
+            for i in range(items_per_user)
+        )
+    session.commit()
+    return emails
+
+
+def clean_dataset(*, session: Session, prefix: str = EMAIL_PREFIX) -> None:
+    # The items are deleted by the foreign key's ON DELETE CASCADE
+    session.execute(delete(User).where(col(User.email).startswith(prefix)))
+    session.commit()
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def request(
+        self,
+        operation: str,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        **kwargs: object,
+    ) -> httpx.Response | None:
+        """
+        Send the request, recording its latency. Connection errors and
+        timeouts, frequent on an overloaded server, are counted as errors
+        instead of stopping the run.
+        """
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)  # type: ignore[arg-type]
+        except httpx.HTTPError:
+            self.latencies[operation].append(time.perf_counter() - start)
+            self.errors[operation] += 1
+            return None
+        self.latencies[operation].append(time.perf_counter() - start)
+        if response.is_error:
+            self.errors[operation] += 1
+        return response
+
+
+@dataclass
+class OperationStats:
+    operation: str
+    count: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+@dataclass
+class LoadTestResult:
+    duration: float
+    concurrency: int
+    operations: list[OperationStats] = field(default_factory=list)
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    # Nearest rank
+    index = max(0, int(len(sorted_values) * percent / 100 + 0.5) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def summarize(
+    recorder: Recorder, *, duration: float, concurrency: int
+) -> LoadTestResult:
+    result = LoadTestResult(duration=duration, concurrency=concurrency)
+    for operation, latencies in sorted(recorder.latencies.items()):
+        values = sorted(latencies)
+        result.operations.append(
+            OperationStats(
+                operation=operation,
+                count=len(values),
+                errors=recorder.errors[operation],
+                rps=len(values) / duration,
+                p50_ms=percentile(values, 50) * 1000,
+                p95_ms=percentile(values, 95) * 1000,
+                p99_ms=percentile(values, 99) * 1000,
+            )
+        )
+    return result
+
+
+async def login(
+    client: httpx.AsyncClient, recorder: Recorder, email: str
+) -> str | None:
+    r = await recorder.request(
+        "login",
+        client,
+        "POST",
+        f"{settings.API_V1_STR}/login/access-token",
+        data={"username": email, "password": PASSWORD},
+    )
+    if r is None or r.is_error:
+        return None
+    return str(r.json()["access_token"])
+
+
+async def items_journey(
+    client: httpx.AsyncClient, recorder: Recorder, headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    skip = random.randrange(0, 100, 10)
+    await recorder.request(
+        "items-list",
+        client,
+        "GET",
+        url,
+        params={"skip": skip, "limit": 10},
+        headers=headers,
+    )
+    r = await recorder.request(
+        "items-create",
+        client,
+        "POST",
+        url,
+        json={"title": "Load test", "description": "Created by the load test"},
+        headers=headers,
+    )
+    if r is None or r.is_error:
+        return
+    item_url = f"{url}{r.json()['id']}"
+    await recorder.request("items-read", client, "GET", item_url, headers=headers)
+    await recorder.request(
+        "items-update",
+        client,
+        "PUT",
+        item_url,
+        json={"title": "Updated"},
+        headers=headers,
+    )
+    await recorder.request("items-delete", client, "DELETE", item_url, headers=headers)
+
+
+async def users_journey(
+    client: httpx.AsyncClient, recorder: Recorder, headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/users/"
+    await recorder.request(
+        "users-list", client, "GET", url, params={"limit": 10}, headers=headers
+    )
+    r = await recorder.request(
+        "users-create",
+        client,
+        "POST",
+        url,
+        json={"email": bench_email(f"new-{uuid.uuid4().hex}"), "password": PASSWORD},
+        headers=headers,
+    )
+    if r is None or r.is_error:
+        return
+    user_url = f"{url}{r.json()['id']}"
+    await recorder.request("users-read", client, "GET", user_url, headers=headers)
+    await recorder.request("users-delete", client, "DELETE", user_url, headers=headers)
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    *,
+    email: str,
+    superuser_headers: dict[str, str],
+    deadline: float,
+    login_every: int,
+    users_share: float,
+) -> None:
+    headers: dict[str, str] = {}
+    iteration = 0
+    while time.monotonic() < deadline:
+        if iteration % login_every == 0:
+            token = await login(client, recorder, email)
+            if token is None:
+                # Tried again, after a pause not to hammer a failing server
+                await asyncio.sleep(0.1)
+                continue
+            headers = {"Authorization": f"Bearer {token}"}
+        if random.random() < users_share:
+            await users_journey(client, recorder, superuser_headers)
+        else:
+            await items_journey(client, recorder, headers)
+        iteration += 1
+
+
+async def run_load_test(
+    client: httpx.AsyncClient,
+    *,
+    emails: list[str],
+    concurrency: int,
+    duration: float,
+    login_every: int = 20,
+    users_share: float = 0.1,
+) -> LoadTestResult:
+    """
+    Run `concurrency` virtual users, each one a seeded user, for `duration`
+    seconds.
+    """
+    recorder = Recorder()
+    r = await client.post(
+        f"{settings.API_V1_STR}/login/access-token",
+        data={
+            "username": settings.FIRST_SUPERUSER,
+            "password": settings.FIRST_SUPERUSER_PASSWORD,
+        },
+    )
+    r.raise_for_status()
+    superuser_headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    start = time.monotonic()
+    await asyncio.gather(
+        *(
+            virtual_user(
+                client,
+                recorder,
+                email=emails[i % len(emails)],
+                superuser_headers=superuser_headers,
+                deadline=start + duration,
+                login_every=login_every,
+                users_share=users_share,
+            )
+            for i in range(concurrency)
+        )
+    )
+    elapsed = time.monotonic() - start
+    return summarize(recorder, duration=elapsed, concurrency=concurrency)
+
+
+def compare_to_baseline(
+    result: LoadTestResult, baseline: LoadTestResult, *, max_regression: float
+) -> list[str]:
+    """
+    The operations whose p95 latency grew, or throughput dropped, more than
+    `max_regression` percent from the baseline.
+    """
+    previous = {stats.operation: stats for stats in baseline.operations}
+    regressions = []
+    for stats in result.operations:
+        before = previous.get(stats.operation)
+        if before is None:
+            continue
+        if stats.p95_ms > before.p95_ms * (1 + max_regression / 100):
+            regressions.append(
+                f"{stats.operation}: p95 {before.p95_ms:.1f} ms -> {stats.p95_ms:.1f} ms"
+            )
+        if stats.rps < before.rps * (1 - max_regression / 100):
+            regressions.append(
+                f"{stats.operation}: {before.rps:.1f} -> {stats.rps:.1f} requests/s"
+            )
+    return regressions
+
+
+def load_result(path: Path) -> LoadTestResult:
+    data = json.loads(path.read_text())
+    operations = [OperationStats(**stats) for stats in data.pop("operations")]
+    return LoadTestResult(**data, operations=operations)
+
+
+def print_result(result: LoadTestResult) -> None:
+    print(
+        f"{result.concurrency} virtual users for {result.duration:.1f} s\n"
+        f"{'operation':<14} {'count':>7} {'errors':>6} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for s in result.operations:
+        print(
+            f"{s.operation:<14} {s.count:>7} {s.errors:>6} {s.rps:>8.1f} "
+            f"{s.p50_ms:>8.1f} {s.p95_ms:>8.1f} {s.p99_ms:>8.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the API")
+    parser.add_argument(
+        "--base-url",
+        help="URL of a running server, by default the app is run in this process",
+    )
+    parser.add_argument("--users", type=int, default=20, help="Users to seed")
+    parser.add_argument("--items-per-user", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--baseline", type=Path, help="Compare to this result")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=20,
+        help="Percent of p95 increase or throughput drop to fail at",
+    )
+    parser.add_argument(
+        "--clean", action="store_true", help="Delete the seeded data at the end"
+    )
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with Session(engine) as session:
+        # The superuser manages the users
+        init_db(session)
+        emails = seed_dataset(
+            session=session, users=args.users, items_per_user=args.items_per_user
+        )
+
+    async def run_with(
+        transport: httpx.AsyncBaseTransport, base_url: str
+    ) -> LoadTestResult:
+        async with httpx.AsyncClient(
+            transport=transport, base_url=base_url, timeout=30
+        ) as client:
+            return await run_load_test(
+                client,
+                emails=emails,
+                concurrency=args.concurrency,
+                duration=args.duration,
+            )
+
+    async def run() -> LoadTestResult:
+        if args.base_url:
+            return await run_with(httpx.AsyncHTTPTransport(), args.base_url)
+        from app.main import app
+
+        # Started and stopped as a worker is, with its threadpool sizes, warm
+        # up and drain
+        async with app.router.lifespan_context(app):
+            return await run_with(httpx.ASGITransport(app=app), "http://test")
+
+    try:
+        result = asyncio.run(run())
+    finally:
+        if args.clean:
+            with Session(engine) as session:
+                clean_dataset(session=session)
+    print_result(result)
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(asdict(result), indent=2))
+    if args.baseline:
+        regressions = compare_to_baseline(
+            result, load_result(args.baseline), max_regression=args.max_regression
+        )
+        if regressions:
+            sys.exit("Regressions from the baseline:\n" + "\n".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
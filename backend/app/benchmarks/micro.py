@@ -0,0 +1,236 @@
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from pathlib import Path
+
+import jwt
+from sqlmodel import Session
+
+from app import crud
+from app.api.deps import get_current_user
+from app.benchmarks.load_test import PASSWORD, bench_email, clean_dataset
+from app.core import security
+from app.core.config import settings
+from app.core.db import engine
+from app.models import ItemCreate, TokenPayload, UserCreate
+from app.utils import render_email_template
+
+# Not the prefix of the load test, its dataset is kept between the runs
+EMAIL_PREFIX = "micro-bench-"
+
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[[], object]
+    # Calls per measurement, lower for the password hashing ones
+    number: int = 1000
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    calls: int
+    best_us: float
+    median_us: float
+    # Memory allocated by a single call at its peak
+    peak_kib: float
+    # Allocated and still alive after a call, e.g. objects kept in a session
+    retained_kib: float
+
+
+def measure(benchmark: Benchmark, *, repeat: int = 5) -> BenchmarkResult:
+    func, number = benchmark.func, benchmark.number
+    func()  # Warm up caches, as in a running server
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+
+    # Measured apart, tracing the allocations slows the calls down
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return BenchmarkResult(
+        name=benchmark.name,
+        calls=number * repeat,
+        best_us=min(timings) * 1_000_000,
+        median_us=statistics.median(timings) * 1_000_000,
+        peak_kib=(peak - before) / 1024,
+        retained_kib=(after - before) / 1024,
+    )
+
+
+@contextmanager
+def benchmarks(session: Session) -> Iterator[list[Benchmark]]:
+    """
+    The benchmarks of the crud and security functions, with the users and
+    items they need, removed at the end.
+    """
+    counter = itertools.count()
+    user = crud.create_user(
+        session=session,
+        user_create=UserCreate(
+            email=bench_email("user", prefix=EMAIL_PREFIX), password=PASSWORD
+        ),
+    )
+    token = security.create_access_token(user.id, expires_delta=timedelta(hours=1))
+
+    def create_user() -> None:
+        user_in = UserCreate(
+            email=bench_email(f"user-{next(counter)}", prefix=EMAIL_PREFIX),
+            password=PASSWORD,
+        )
+        crud.create_user(session=session, user_create=user_in)
+
+    def create_item() -> None:
+        item_in = ItemCreate(title="Benchmark", description="Micro benchmark")
+        crud.create_item(session=session, item_in=item_in, owner_id=user.id)
+
+    try:
+        yield [
+            Benchmark("create_user", create_user, number=5),
+            Benchmark(
+                "authenticate",
+                lambda: crud.authenticate(
+                    session=session, email=user.email, password=PASSWORD
+                ),
+                number=5,
+            ),
+            Benchmark("create_item", create_item, number=200),
+            Benchmark(
+                "get_user_by_email",
+                lambda: crud.get_user_by_email(session=session, email=user.email),
+            ),
+            Benchmark(
+                "create_access_token",
+                lambda: security.create_access_token(
+                    user.id, expires_delta=timedelta(hours=1)
+                ),
+            ),
+            # The token decoding done by get_current_user, and then all of it,
+            # with the user lookup
+            Benchmark(
+                "decode_access_token",
+                lambda: TokenPayload(
+                    **jwt.decode(
+                        token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+                    )
+                ),
+            ),
+            Benchmark(
+                "get_current_user",
+                lambda: get_current_user(session=session, token=token),
+            ),
+            Benchmark(
+                "render_email_template",
+                lambda: render_email_template(
+                    template_name="new_account.html",
+                    context={
+                        "project_name": "Benchmark",
+                        "username": user.email,
+                        "password": PASSWORD,
+                        "email": user.email,
+                        "link": "http://localhost:5173",
+                    },
+                ),
+            ),
+        ]
+    finally:
+        session.rollback()
+        clean_dataset(session=session, prefix=EMAIL_PREFIX)
+
+
+def compare_to_baseline(
+    results: list[BenchmarkResult],
+    baseline: list[BenchmarkResult],
+    *,
+    max_regression: float,
+) -> list[str]:
+    """
+    The benchmarks whose best time or peak memory grew more than
+    `max_regression` percent from the baseline.
+    """
+    previous = {result.name: result for result in baseline}
+    limit = 1 + max_regression / 100
+    regressions = []
+    for result in results:
+        before = previous.get(result.name)
+        if before is None:
+            continue
+        if result.best_us > before.best_us * limit:
+            regressions.append(
+                f"{result.name}: {before.best_us:.1f} µs -> {result.best_us:.1f} µs"
+            )
+        if result.peak_kib > before.peak_kib * limit:
+            regressions.append(
+                f"{result.name}: {before.peak_kib:.1f} KiB -> "
+                f"{result.peak_kib:.1f} KiB peak"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time and memory per call of the crud and security functions"
+    )
+    parser.add_argument("names", nargs="*", help="Benchmarks to run, by default all")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--baseline", type=Path, help="Compare to these results")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=20,
+        help="Percent of time or memory increase to fail at",
+    )
+    args = parser.parse_args()
+
+    results = []
+    with Session(engine) as session, benchmarks(session) as all_benchmarks:
+        for benchmark in all_benchmarks:
+            if args.names and benchmark.name not in args.names:
+                continue
+            results.append(measure(benchmark, repeat=args.repeat))
+
+    print(
+        f"{'benchmark':<22} {'calls':>6} {'best µs':>10} {'median µs':>10} "
+        f"{'peak KiB':>9} {'kept KiB':>9}"
+    )
+    for r in results:
+        print(
+            f"{r.name:<22} {r.calls:>6} {r.best_us:>10.1f} {r.median_us:>10.1f} "
+            f"{r.peak_kib:>9.1f} {r.retained_kib:>9.1f}"
+        )
+    if args.save_baseline:
+        args.save_baseline.write_text(
+            json.dumps([asdict(r) for r in results], indent=2)
+        )
+    if args.baseline:
+        baseline = [
+            BenchmarkResult(**data) for data in json.loads(args.baseline.read_text())
+        ]
+        regressions = compare_to_baseline(
+            results, baseline, max_regression=args.max_regression
+        )
+        if regressions:
+            sys.exit("Regressions from the baseline:\n" + "\n".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from sqlalchemy import Connection, text
+
+from app.core.db import engine
+from app.core.ids import uuid7
+
+GENERATORS: dict[str, Callable[[], uuid.UUID]] = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+@dataclass
+class PrimaryKeyResult:
+    name: str
+    rows: int
+    rows_per_second: float
+    # Larger with the half empty pages left by the splits of random inserts
+    index_kib: float
+
+
+def insert_rows(
+    connection: Connection,
+    table: str,
+    generate_id: Callable[[], uuid.UUID],
+    *,
+    rows: int,
+    batch_size: int,
+) -> float:
+    statement = text(f"INSERT INTO {table} (id, title) VALUES (:id, :title)")
+    start = time.perf_counter()
+    for batch_start in range(0, rows, batch_size):
+        batch = range(batch_start, min(batch_start + batch_size, rows))
+        connection.execute(
+            statement, [{"id": generate_id(), "title": f"Item {i}"} for i in batch]
+        )
+        # One transaction per batch, as the requests inserting rows
+        connection.commit()
+    return time.perf_counter() - start
+
+
+def run_benchmark(*, rows: int, batch_size: int) -> list[PrimaryKeyResult]:
+    """
+    Insert the same rows in a table with random (v4) and time-ordered (v7)
+    UUID primary keys, and compare the throughput and the size of the
+    primary key indexes.
+    """
+    results = []
+    with engine.connect() as connection:
+        for name, generate_id in GENERATORS.items():
+            table = f"bench_primary_key_{name}"
+            connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            connection.execute(
+                text(f"CREATE TABLE {table} (id uuid PRIMARY KEY, title text)")
+            )
+            connection.commit()
+            try:
+                elapsed = insert_rows(
+                    connection, table, generate_id, rows=rows, batch_size=batch_size
+                )
+                index_bytes = connection.execute(
+                    text("SELECT pg_relation_size(:index)"), {"index": f"{table}_pkey"}
+                ).scalar_one()
+                results.append(
+                    PrimaryKeyResult(
+                        name=name,
+                        rows=rows,
+                        rows_per_second=rows / elapsed,
+                        index_kib=index_bytes / 1024,
+                    )
+                )
+            finally:
+                connection.rollback()
+                connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+                connection.commit()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the inserts with uuid4 and uuid7 primary keys"
+    )
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    results = run_benchmark(rows=args.rows, batch_size=args.batch_size)
+    print(f"{'key':<6} {'rows':>9} {'rows/s':>9} {'index KiB':>10}")
+    for r in results:
+        print(f"{r.name:<6} {r.rows:>9} {r.rows_per_second:>9.0f} {r.index_kib:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+from collections import deque
+
+import anyio
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import REQUESTS_SHED
+
+# Routes checking passwords, kept apart so that a wave of logins can't take
+# the threads and connections of the other requests
+AUTH_PATHS = (
+    "/login/",
+    "/password-recovery/",
+    "/reset-password/",
+    "/users/signup",
+)
+# The health checks, cheap and used by the orchestrator, are never rejected
+EXEMPT_PATHS = ("/utils/health",)
+
+
+class ConcurrencyLimiter:
+    """
+    Let `limit` requests in at once, and up to `queue_size` more wait for
+    their turn, in order, for at most `timeout` seconds.
+    """
+
+    def __init__(self, *, limit: int, queue_size: int, timeout: float) -> None:
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiters: deque[anyio.Event] = deque()
+
+    async def acquire(self) -> bool:
+        if self.active < self.limit:
+            self.active += 1
+            return True
+        if len(self.waiters) >= self.queue_size:
+            return False
+        event = anyio.Event()
+        self.waiters.append(event)
+        try:
+            with anyio.move_on_after(self.timeout):
+                await event.wait()
+        except BaseException:
+            # Cancelled, e.g. the client went away
+            if event.is_set():
+                self.release()
+            else:
+                self.waiters.remove(event)
+            raise
+        if event.is_set():
+            return True
+        self.waiters.remove(event)
+        return False
+
+    def release(self) -> None:
+        if self.waiters:
+            # Handed over to the next request, active stays the same
+            self.waiters.popleft().set()
+        else:
+            self.active -= 1
+
+
+def get_route_group(scope: Scope) -> str | None:
+    path = scope["path"]
+    if not path.startswith(settings.API_V1_STR):
+        return None
+    path = path.removeprefix(settings.API_V1_STR)
+    if path.startswith(EXEMPT_PATHS):
+        return None
+    if path.startswith(AUTH_PATHS):
+        return "auth"
+    return "reads" if scope["method"] in ("GET", "HEAD") else "writes"
+
+
+def get_limiters() -> dict[str, ConcurrencyLimiter]:
+    """
+    Limits splitting the database pool of the worker between the groups: a
+    fifth for the logins, three tenths for the writes and the rest for the
+    reads. Together they admit no more requests than there are connections
+    (and threads), with at least one each.
+    """
+    capacity = settings.POSTGRES_POOL_SIZE + settings.POSTGRES_MAX_OVERFLOW
+    auth = max(capacity // 5, 1)
+    writes = max(capacity * 3 // 10, 1)
+    limits = {
+        "auth": auth,
+        "reads": max(capacity - auth - writes, 1),
+        "writes": writes,
+    }
+    return {
+        group: ConcurrencyLimiter(
+            limit=limit, queue_size=limit, timeout=settings.ADMISSION_QUEUE_TIMEOUT
+        )
+        for group, limit in limits.items()
+    }
+
+
+class AdmissionControlMiddleware:
+    """
+    Reject the requests with a 503 when their group of routes is saturated,
+    instead of piling them up in the threadpool and the database pool until
+    they all time out.
+    """
+
+    def __init__(
+        self, app: ASGIApp, limiters: dict[str, ConcurrencyLimiter] | None = None
+    ) -> None:
+        self.app = app
+        self.limiters = limiters if limiters is not None else get_limiters()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        group = get_route_group(scope) if scope["type"] == "http" else None
+        limiter = self.limiters.get(group) if group else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        if not await limiter.acquire():
+            REQUESTS_SHED.labels(group).inc()
+            response = JSONResponse(
+                {"detail": "The server is busy, try again"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -1,10 +1,46 @@
+from sqlalchemy import Engine
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.queries import instrument_queries
+from app.core.replicas import ReplicaPool
 from app.models import User, UserCreate
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    pool_size=settings.POSTGRES_POOL_SIZE,
+    max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+)
+instrument_engine(engine)
+instrument_queries(engine)
+
+# The pool metrics are the ones of the primary
+replicas = ReplicaPool(
+    [
+        create_engine(uri, connect_args={"connect_timeout": 2})
+        for uri in settings.SQLALCHEMY_REPLICA_URIS
+    ]
+)
+for replica in replicas.replicas:
+    instrument_queries(replica.engine)
+
+
+def warm_pool(engine: Engine, connections: int) -> None:
+    """
+    Open connections of the pool ahead of the first requests, they stay in
+    the pool when they are returned.
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in opened:
+            connection.close()
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
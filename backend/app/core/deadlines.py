@@ -0,0 +1,91 @@
+import logging
+import time
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+from fastapi import HTTPException, Request
+from psycopg.errors import LockNotAvailable, QueryCanceled
+from sqlalchemy import Connection, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import SessionTransaction
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.logs import current_request
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_HEADER = "X-Request-Timeout"
+
+Endpoint = TypeVar("Endpoint", bound=Callable[..., Any])
+
+
+def latency_budget(milliseconds: int) -> Callable[[Endpoint], Endpoint]:
+    """
+    Declare the time in which the route must answer, instead of the default
+    REQUEST_BUDGET_MS.
+    """
+
+    def decorator(endpoint: Endpoint) -> Endpoint:
+        endpoint.latency_budget_ms = milliseconds  # type: ignore[attr-defined]
+        return endpoint
+
+    return decorator
+
+
+def get_deadline(request: Request) -> float:
+    """
+    Monotonic time by which the request must be answered: its start plus the
+    budget of its route, or the one of the client if lower.
+    """
+    endpoint = getattr(request.scope.get("route"), "endpoint", None)
+    budget_ms = getattr(endpoint, "latency_budget_ms", settings.REQUEST_BUDGET_MS)
+    if header := request.headers.get(DEADLINE_HEADER):
+        try:
+            client_budget_ms = int(header)
+        except ValueError:
+            client_budget_ms = 0
+        if client_budget_ms <= 0:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid {DEADLINE_HEADER} header"
+            )
+        budget_ms = min(budget_ms, client_budget_ms)
+    context = current_request.get()
+    start = context.start if context else time.perf_counter()
+    return start + budget_ms / 1000
+
+
+def set_timeouts(session: Session, deadline: float, *, write: bool) -> None:
+    """
+    Limit the statements of each transaction of the session to the time left
+    before the deadline, and the wait for locks of the writing ones.
+    """
+
+    @event.listens_for(session, "after_begin")
+    def on_begin(
+        _session: Session, _transaction: SessionTransaction, connection: Connection
+    ) -> None:
+        remaining_ms = max(int((deadline - time.perf_counter()) * 1000), 1)
+        statement = f"SET LOCAL statement_timeout = {remaining_ms}"
+        if write:
+            lock_timeout_ms = min(remaining_ms, settings.POSTGRES_LOCK_TIMEOUT_MS)
+            statement += f"; SET LOCAL lock_timeout = {lock_timeout_ms}"
+        connection.exec_driver_sql(statement)
+
+
+def timeout_error(e: DBAPIError) -> HTTPException | None:
+    """
+    The response for a statement cancelled by the timeouts, None for other
+    errors.
+    """
+    if isinstance(e.orig, LockNotAvailable):
+        logger.warning(f"Lock wait timed out: {e.orig}")
+        return HTTPException(
+            status_code=503,
+            detail="The resource is busy, try again",
+            headers={"Retry-After": "1"},
+        )
+    if isinstance(e.orig, QueryCanceled):
+        logger.warning(f"Statement cancelled at the deadline: {e.orig}")
+        return HTTPException(status_code=504, detail="The request took too long")
+    return None
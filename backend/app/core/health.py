@@ -0,0 +1,93 @@
+import logging
+import socket
+import threading
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.core.db import engine, replicas
+from app.models import HealthCheck
+
+logger = logging.getLogger(__name__)
+
+
+def check_database() -> str:
+    # With all the connections in use, the query would wait for one and the
+    # worker can't take more requests anyway
+    pool = engine.pool
+    capacity = settings.POSTGRES_POOL_SIZE + settings.POSTGRES_MAX_OVERFLOW
+    if getattr(pool, "checkedout", lambda: 0)() >= capacity:
+        return "saturated"
+    try:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+    except SQLAlchemyError as e:
+        logger.warning(f"Database unavailable: {e}")
+        return "unavailable"
+    return "ok"
+
+
+def check_replicas() -> str:
+    # The last result of the background health checks
+    healthy = sum(replica.healthy for replica in replicas.replicas)
+    if healthy == len(replicas.replicas):
+        return "ok"
+    # The reads go to the primary when none is healthy
+    return "degraded" if healthy else "unavailable"
+
+
+def check_smtp() -> str:
+    assert settings.SMTP_HOST
+    try:
+        with socket.create_connection(
+            (settings.SMTP_HOST, settings.SMTP_PORT), timeout=1
+        ):
+            pass
+    except OSError as e:
+        logger.warning(f"SMTP server unavailable: {e}")
+        return "unavailable"
+    return "ok"
+
+
+class ReadinessProbe:
+    """
+    The state of the dependencies of the worker, checked at most once per
+    HEALTH_CHECK_CACHE_TTL whatever the number of probes.
+
+    Only the database makes the worker unavailable, the replicas and the
+    SMTP server (used by the email worker) make it degraded.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.result: HealthCheck | None = None
+        self.checked_at = 0.0
+
+    def cached(self) -> HealthCheck | None:
+        if time.monotonic() - self.checked_at < settings.HEALTH_CHECK_CACHE_TTL:
+            return self.result
+        return None
+
+    def check(self) -> HealthCheck:
+        with self.lock:
+            # Checked by another probe while this one was waiting
+            if result := self.cached():
+                return result
+            checks = {"database": check_database()}
+            if replicas:
+                checks["replicas"] = check_replicas()
+            if settings.emails_enabled:
+                checks["smtp"] = check_smtp()
+            if checks["database"] != "ok":
+                status = "unavailable"
+            elif all(check == "ok" for check in checks.values()):
+                status = "ok"
+            else:
+                status = "degraded"
+            self.result = HealthCheck(status=status, checks=checks)
+            self.checked_at = time.monotonic()
+            return self.result
+
+
+readiness_probe = ReadinessProbe()
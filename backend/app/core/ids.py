@@ -0,0 +1,39 @@
+import secrets
+import threading
+import time
+import uuid
+
+# Milliseconds and counter of the last UUIDv7 generated in this process
+_last_ms = 0
+_counter = 0
+_lock = threading.Lock()
+
+COUNTER_MAX = 0xFFF
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUID (version 7 of RFC 9562): the Unix time in milliseconds
+    in the first 48 bits, so new rows are appended at the end of the B-tree
+    indexes instead of being scattered across them.
+
+    A counter in the 12 bits after the version keeps the ids generated in
+    the same millisecond in order, in this process. It starts at a random
+    value under half its range, and moves the time ahead when exhausted.
+    """
+    global _last_ms, _counter
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _counter = secrets.randbits(11)
+        elif _counter < COUNTER_MAX:
+            _counter += 1
+        else:
+            _last_ms += 1
+            _counter = 0
+        unix_ms, counter = _last_ms, _counter
+    random = secrets.randbits(62)
+    return uuid.UUID(
+        int=unix_ms << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | random
+    )
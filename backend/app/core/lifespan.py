@@ -0,0 +1,54 @@
+import logging
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import configure_mappers
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine, replicas, warm_pool
+from app.core.security import get_pwd_context
+from app.utils import precompile_email_templates
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up() -> None:
+    """
+    Pay at startup what the first requests of the worker would: the database
+    connections, the configuration of the mappers, the password hasher and
+    the email templates. Also check the replicas before taking requests, and
+    then in the background.
+    """
+    configure_mappers()
+    get_pwd_context()
+    precompile_email_templates()
+    connections = settings.POSTGRES_POOL_WARMUP
+    if connections is None:
+        connections = settings.POSTGRES_POOL_SIZE
+    # More than the pool keeps would be closed when returned
+    connections = min(connections, settings.POSTGRES_POOL_SIZE)
+    try:
+        warm_pool(engine, connections)
+        crud.has_extension(engine, "pg_trgm")
+    except SQLAlchemyError as e:
+        logger.warning(f"Could not warm up the database pool: {e}")
+    for replica in replicas.replicas:
+        try:
+            warm_pool(replica.engine, connections)
+        except SQLAlchemyError as e:
+            logger.warning(f"Could not warm up replica {replica.engine.url.host}: {e}")
+    replicas.start()
+
+
+def drain() -> None:
+    """
+    Release the resources of the worker, once the server has stopped
+    accepting connections and finished the requests in progress.
+
+    It doesn't wait for any work: the app runs none outside of the requests,
+    the emails are sent from the outbox by the email worker.
+    """
+    replicas.stop()
+    engine.dispose()
+    for replica in replicas.replicas:
+        replica.engine.dispose()
@@ -0,0 +1,204 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import get_operation
+
+access_logger = logging.getLogger("app.access")
+
+# Attributes of every LogRecord, the others come from `extra` (except the
+# colored duplicate of the message added by uvicorn)
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "color_message",
+}
+
+
+@dataclass
+class RequestContext:
+    request_id: str
+    scope: Scope
+    start: float = field(default_factory=time.perf_counter)
+
+
+current_request: ContextVar[RequestContext | None] = ContextVar(
+    "current_request", default=None
+)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Add the id, route and latency so far of the current request to the
+    records logged while handling it.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request = current_request.get()
+        if request is not None:
+            record.request_id = request.request_id
+            record.route = get_operation(request.scope)
+            record.latency_ms = round((time.perf_counter() - request.start) * 1000, 1)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a share of the records under WARNING of the loggers in
+    `rates` (by logger name prefix).
+    """
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, rate in self.rates.items():
+            if record.name == name or record.name.startswith(f"{name}."):
+                return random.random() < rate
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in RECORD_ATTRIBUTES
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class LogQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the default, keep the message and the traceback apart for
+        # the formatter in the listener thread
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: QueueListener | None = None
+
+
+def _start_listener(queue_handler: QueueHandler) -> None:
+    global _listener
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if settings.LOG_FORMAT == "json":
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(
+            logging.Formatter("%(levelname)s:%(name)s:%(message)s")
+        )
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+
+
+def get_queue_handler() -> LogQueueHandler:
+    queue_handler = LogQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(SamplingFilter(settings.LOG_DEBUG_SAMPLE_RATES))
+    queue_handler.addFilter(RequestContextFilter())
+    return queue_handler
+
+
+def setup_logging() -> None:
+    """
+    Log through a queue, so that request threads only enqueue the records and
+    the formatting and writing happens in a background thread.
+
+    Called by the entry points, not when the app is imported.
+    """
+    root = logging.getLogger()
+    if any(isinstance(handler, LogQueueHandler) for handler in root.handlers):
+        return
+    queue_handler = get_queue_handler()
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL)
+    for name in settings.LOG_DEBUG_SAMPLE_RATES:
+        logging.getLogger(name).setLevel(logging.DEBUG)
+    _start_listener(queue_handler)
+    # The listener thread isn't copied by fork, and the queue could be left
+    # locked by it, start both again in the child process
+    os.register_at_fork(after_in_child=lambda: _start_listener(queue_handler))
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """
+    Write the records still in the queue, before exiting.
+    """
+    if _listener and _listener._thread:
+        _listener.stop()
+
+
+class RequestContextMiddleware:
+    """
+    Give each request an id, taken from the X-Request-ID header set by the
+    proxy or generated, and log the request once it's handled.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64]
+        request = RequestContext(request_id=request_id or uuid.uuid4().hex, scope=scope)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = request.request_id
+            await send(message)
+
+        token = current_request.set(request)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            access_logger.info(
+                f"{scope['method']} {scope['path']} {status_code}",
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                },
+            )
+            current_request.reset(token)
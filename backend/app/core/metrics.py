@@ -0,0 +1,170 @@
+import os
+import time
+from typing import Any
+from wsgiref.simple_server import WSGIServer
+
+from anyio import to_thread
+from fastapi.routing import APIRoute
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.threadpool import get_blocking_limiter
+
+# The metrics are written to files in PROMETHEUS_MULTIPROC_DIR when it's set
+# (by app/server.py), so that any worker can report the sum of all of them.
+# Gauges use "livesum" to only add up the values of the running workers.
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by operation",
+    ["operation", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter(
+    "http_requests",
+    "Requests by operation and status code",
+    ["operation", "method", "status"],
+)
+REQUESTS_SHED = Counter(
+    "http_requests_shed",
+    "Requests rejected by the admission control, by route group",
+    ["group"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled",
+    multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Connections the database pools keep open",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Database connections in use",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_TOKENS = Gauge(
+    "threadpool_tokens",
+    "Threads available to run sync routes and dependencies",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_TOKENS_IN_USE = Gauge(
+    "threadpool_tokens_in_use",
+    "Threads running sync routes and dependencies",
+    multiprocess_mode="livesum",
+)
+BLOCKING_THREADPOOL_TOKENS = Gauge(
+    "blocking_threadpool_tokens",
+    "Threads available to run blocking work without the database",
+    multiprocess_mode="livesum",
+)
+BLOCKING_THREADPOOL_TOKENS_IN_USE = Gauge(
+    "blocking_threadpool_tokens_in_use",
+    "Threads running blocking work without the database",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "Password hashes and verifications waiting or running",
+    multiprocess_mode="livesum",
+)
+
+
+def instrument_engine(engine: Engine) -> None:
+    pool_size = getattr(engine.pool, "size", lambda: 0)()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(*_args: Any) -> None:
+        # Set here and not at import time, so it's set in each worker process
+        DB_POOL_SIZE.set(pool_size)
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(*_args: Any) -> None:
+        DB_POOL_CHECKED_OUT.dec()
+
+
+def get_operation(scope: Scope) -> str:
+    """
+    The operation id of the route (as in the OpenAPI schema), not the path,
+    to keep the number of label values bounded.
+    """
+    route = scope.get("route")
+    if isinstance(route, APIRoute):
+        return route.unique_id
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        return str(endpoint.__name__)
+    return "unmatched"
+
+
+def update_threadpool_metrics() -> None:
+    limiter = to_thread.current_default_thread_limiter()
+    THREADPOOL_TOKENS.set(limiter.total_tokens)
+    THREADPOOL_TOKENS_IN_USE.set(limiter.borrowed_tokens)
+    blocking_limiter = get_blocking_limiter()
+    BLOCKING_THREADPOOL_TOKENS.set(blocking_limiter.total_tokens)
+    BLOCKING_THREADPOOL_TOKENS_IN_USE.set(blocking_limiter.borrowed_tokens)
+
+
+class PrometheusMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        update_threadpool_metrics()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            operation = get_operation(scope)
+            method = scope["method"]
+            REQUEST_DURATION.labels(operation=operation, method=method).observe(
+                duration
+            )
+            REQUESTS.labels(
+                operation=operation, method=method, status=str(status_code)
+            ).inc()
+            REQUESTS_IN_PROGRESS.dec()
+            update_threadpool_metrics()
+
+
+def get_registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+        return registry
+    return REGISTRY
+
+
+def start_metrics_server(host: str, port: int) -> WSGIServer:
+    """
+    Serve the metrics in a thread, on a port of their own that the proxy
+    doesn't route, so they're only reachable from the internal network.
+    """
+    server, _thread = start_http_server(port, addr=host, registry=get_registry())
+    return server
@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import FastAPI
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OpenAPIDocument:
+    content: bytes
+    gzip_content: bytes
+    etag: str
+    gzip_etag: str
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> "OpenAPIDocument":
+        digest = hashlib.sha256(content).hexdigest()
+        return cls(
+            content=content,
+            # mtime=0 keeps the compressed bytes identical across workers
+            gzip_content=gzip.compress(content, compresslevel=9, mtime=0),
+            etag=f'"{digest}"',
+            gzip_etag=f'"{digest}-gzip"',
+        )
+
+
+def serialize_openapi(app: FastAPI) -> bytes:
+    # Same encoding options as the JSONResponse FastAPI would use
+    return json.dumps(
+        app.openapi(),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def load_openapi_document(
+    app: FastAPI, schema_file: str | None = None
+) -> OpenAPIDocument:
+    """
+    Build the OpenAPI document once.
+
+    When `schema_file` is set and exists, its bytes are served as is (e.g. a
+    file written at build time or by the first worker), otherwise the schema
+    is generated and, if `schema_file` is set, written there for the others.
+    """
+    if schema_file:
+        path = Path(schema_file)
+        if path.is_file():
+            logger.info(f"Loading OpenAPI schema from {path}")
+            return OpenAPIDocument.from_bytes(path.read_bytes())
+    content = serialize_openapi(app)
+    if schema_file:
+        write_openapi_file(content, Path(schema_file))
+    return OpenAPIDocument.from_bytes(content)
+
+
+def write_openapi_file(content: bytes, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file and rename it, so concurrent readers never
+    # see a partially written schema
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(content)
+    tmp_path.replace(path)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def install_openapi_route(app: FastAPI, document: OpenAPIDocument) -> None:
+    """
+    Replace the default OpenAPI route, that serializes the schema on every
+    request, with one serving the precomputed bytes.
+    """
+    assert app.openapi_url, "the app has no OpenAPI URL to serve"
+
+    async def openapi(request: Request) -> Response:
+        accepts_gzip = "gzip" in request.headers.get("accept-encoding", "")
+        etag = document.gzip_etag if accepts_gzip else document.etag
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        if accepts_gzip:
+            headers["Content-Encoding"] = "gzip"
+            return Response(
+                document.gzip_content,
+                media_type="application/json",
+                headers=headers,
+            )
+        return Response(
+            document.content, media_type="application/json", headers=headers
+        )
+
+    route = Route(app.openapi_url, openapi, include_in_schema=False)
+    for index, existing in enumerate(app.router.routes):
+        if isinstance(existing, Route) and existing.path == app.openapi_url:
+            app.router.routes[index] = route
+            break
+    else:
+        app.router.routes.append(route)
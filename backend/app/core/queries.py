@@ -0,0 +1,129 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import ExceptionContext
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import get_operation
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    """
+    The SQL statements run while handling a request.
+    """
+
+    scope: Scope
+    count: int = 0
+    duration: float = 0.0
+    # Number of executions of each statement, parameters are not included
+    statements: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def operation(self) -> str:
+        return get_operation(self.scope)
+
+    def repeated_statements(self, threshold: int) -> list[tuple[str, int]]:
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+# Set by QueryStatsMiddleware, the threads running sync routes and
+# dependencies get a copy of the context, so they update the same stats
+current_query_stats: ContextVar[QueryStats | None] = ContextVar(
+    "current_query_stats", default=None
+)
+
+
+def record_query(conn: Any, statement: str) -> None:
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+    stats = current_query_stats.get()
+    if stats is None:
+        return
+    stats.count += 1
+    stats.duration += duration
+    stats.statements[statement] += 1
+    if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        logger.warning(
+            f"Slow query ({duration * 1000:.1f} ms) in "
+            f"{stats.scope['method']} {stats.operation}: {statement}"
+        )
+
+
+def instrument_queries(engine: Engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn: Any, *_args: Any) -> None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(
+        conn: Any, _cursor: Any, statement: str, *_args: Any
+    ) -> None:
+        record_query(conn, statement)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context: ExceptionContext) -> None:
+        # The failed statements (e.g. cancelled at the deadline) are counted
+        # too, and their start time isn't left behind in the pooled
+        # connection. The errors fetching the results have no statement, it
+        # was already recorded
+        if context.connection is not None and context.statement is not None:
+            record_query(context.connection, context.statement)
+
+
+def server_timing(stats: QueryStats) -> str:
+    return f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"'
+
+
+class QueryStatsMiddleware:
+    """
+    Count the queries of each request, flag the statements repeated many
+    times (usually an N+1 query in a loop) and, outside of production, report
+    them in the Server-Timing header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats(scope=scope)
+
+        async def send_wrapper(message: Message) -> None:
+            if (
+                message["type"] == "http.response.start"
+                and settings.ENVIRONMENT != "production"
+            ):
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(stats))
+            await send(message)
+
+        token = current_query_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_query_stats.reset(token)
+            threshold = settings.N_PLUS_ONE_THRESHOLD
+            if threshold:
+                for statement, count in stats.repeated_statements(threshold):
+                    logger.warning(
+                        f"Statement run {count} times in {scope['method']} "
+                        f"{stats.operation}, possible N+1 query: {statement}"
+                    )
@@ -0,0 +1,193 @@
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import Engine, event, text
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary, 0 when it's streaming and has
+# replayed all it received, or when it's not a replica. When the WAL receiver
+# isn't running, it's the age of the last transaction replayed, as the
+# replica may be behind without knowing it, and NULL if nothing was replayed.
+# The status of the receiver is only shown to the roles with
+# pg_read_all_stats, the others only see that it's running.
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AND EXISTS ("
+    "SELECT 1 FROM pg_stat_wal_receiver "
+    "WHERE coalesce(status, 'streaming') = 'streaming') THEN 0 "
+    "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+@dataclass
+class Replica:
+    engine: Engine
+    # Until the first check, run by ReplicaPool.start()
+    healthy: bool = True
+
+
+def check_replica(engine: Engine) -> bool:
+    try:
+        with engine.connect() as connection:
+            lag = connection.execute(LAG_QUERY).scalar()
+    except SQLAlchemyError as e:
+        logger.warning(f"Replica {engine.url.host} is unavailable: {e}")
+        return False
+    if lag is None:
+        logger.warning(f"Replica {engine.url.host} hasn't replayed anything yet")
+        return False
+    if lag > settings.POSTGRES_REPLICA_MAX_LAG:
+        logger.warning(f"Replica {engine.url.host} is {lag:.1f} s behind")
+        return False
+    return True
+
+
+class ReplicaPool:
+    """
+    The replicas taken in turn, skipping the ones that failed their last
+    health check. They are checked by a background thread every
+    POSTGRES_REPLICA_HEALTH_CHECK_INTERVAL, so the requests only read the
+    last result, and a replica is skipped as soon as a connection to it is
+    lost.
+    """
+
+    def __init__(self, engines: list[Engine]) -> None:
+        self.replicas = [Replica(engine) for engine in engines]
+        self.counter = itertools.count()
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+        for replica in self.replicas:
+            self.watch_disconnects(replica)
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def watch_disconnects(self, replica: Replica) -> None:
+        @event.listens_for(replica.engine, "handle_error")
+        def on_error(context: ExceptionContext) -> None:
+            if context.is_disconnect:
+                replica.healthy = False
+
+    def check(self) -> None:
+        for replica in self.replicas:
+            replica.healthy = check_replica(replica.engine)
+
+    def start(self) -> None:
+        """
+        Check the replicas now, then in a background thread. Called in each
+        worker, as the threads don't survive the fork.
+        """
+        if not self.replicas or self.thread:
+            return
+        self.check()
+        self.stopped.clear()
+        self.thread = threading.Thread(
+            target=self.run, name="replica-health-check", daemon=True
+        )
+        self.thread.start()
+
+    def run(self) -> None:
+        while not self.stopped.wait(settings.POSTGRES_REPLICA_HEALTH_CHECK_INTERVAL):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Error checking the replicas")
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def choose(self) -> Engine | None:
+        for _ in self.replicas:
+            replica = self.replicas[next(self.counter) % len(self.replicas)]
+            if replica.healthy:
+                return replica.engine
+        return None
+
+
+class StickyClients:
+    """
+    Clients that wrote recently, by key, whose reads go to the primary for
+    POSTGRES_REPLICA_STICKY_SECONDS. Kept in each process, a client sending
+    its next request to another worker can still read from a replica, with
+    a lag bounded by POSTGRES_REPLICA_MAX_LAG.
+    """
+
+    max_size = 10_000
+
+    def __init__(self) -> None:
+        self.until: dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def mark(self, key: str) -> None:
+        now = time.monotonic()
+        with self.lock:
+            if len(self.until) >= self.max_size:
+                self.until = {k: t for k, t in self.until.items() if t > now}
+            self.until[key] = now + settings.POSTGRES_REPLICA_STICKY_SECONDS
+
+    def __contains__(self, key: str) -> bool:
+        return self.until.get(key, 0) > time.monotonic()
+
+
+sticky_clients = StickyClients()
+
+
+class RoutingSession(Session):
+    """
+    Session reading from a replica when `read_only`, until it writes: the
+    flushes, the DML statements and SELECT ... FOR UPDATE go to the primary,
+    and so do all the statements after them. Raw SQL writes run with
+    `session.execute(text(...))` aren't detected.
+
+    After committing a write, the client of `sticky_key` reads from the
+    primary for a while.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        *,
+        replicas: ReplicaPool,
+        read_only: bool = False,
+        sticky_key: str | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(primary, **kwargs)
+        self.primary = primary
+        self.replicas = replicas
+        self.read_only = read_only
+        self.sticky_key = sticky_key
+        self.replica: Engine | None = None
+        self.wrote = False
+
+    def get_bind(self, mapper: Any = None, *, clause: Any = None, **kw: Any) -> Any:
+        if (
+            self._flushing
+            or getattr(clause, "is_dml", False)
+            or getattr(clause, "_for_update_arg", None) is not None
+        ):
+            self.wrote = True
+        if self.wrote or not self.read_only:
+            return self.primary
+        if self.replica is None:
+            # The same one for the whole session
+            self.replica = self.replicas.choose() or self.primary
+        return self.replica
+
+    def commit(self) -> None:
+        super().commit()
+        if self.wrote and self.sticky_key:
+            sticky_clients.mark(self.sticky_key)
@@ -1,12 +1,30 @@
+import multiprocessing
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, TypeVar
 
 import jwt
-from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.metrics import PASSWORD_HASH_QUEUE_DEPTH
+from app.core.threadpool import run_blocking
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+T = TypeVar("T")
+
+
+@lru_cache
+def get_pwd_context() -> "CryptContext":
+    # passlib and its bcrypt backend are loaded on the first hash or verify,
+    # not when the app is imported
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 ALGORITHM = "HS256"
@@ -20,8 +38,52 @@ def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+async def run_password_hashing(func: Callable[..., T], *args: Any) -> T:
+    """
+    Hash or check passwords with `func` in the threads for blocking work,
+    counted in the queue depth while waiting for a thread too.
+    """
+    with PASSWORD_HASH_QUEUE_DEPTH.track_inprogress():
+        return await run_blocking(func, *args)
+
+
+def password_hash_workers() -> int:
+    return settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+
+
+@lru_cache
+def get_password_hash_executor() -> ProcessPoolExecutor:
+    # Started from a fork server, not forked from the threads of the app
+    return ProcessPoolExecutor(
+        password_hash_workers(), mp_context=multiprocessing.get_context("forkserver")
+    )
+
+
+def shutdown_password_hash_executor() -> None:
+    # Waits for the hashes in progress, if the pool was ever started
+    if get_password_hash_executor.cache_info().currsize:
+        get_password_hash_executor().shutdown()
+        get_password_hash_executor.cache_clear()
+
+
+def get_password_hashes(passwords: list[str], *, parallel: bool = False) -> list[str]:
+    """
+    Hash many passwords at once, in parallel in a pool of processes if
+    `parallel`. Only for the bulk imports of app/import_users.py, each worker
+    of the app would start a pool of its own.
+    """
+    workers = password_hash_workers()
+    if not parallel or len(passwords) <= 1 or workers == 1:
+        return [get_password_hash(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    hashes = get_password_hash_executor().map(
+        get_password_hash, passwords, chunksize=chunksize
+    )
+    return list(hashes)
@@ -0,0 +1,48 @@
+import os
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+from anyio import CapacityLimiter, to_thread
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# Created with the event loop, by configure_threadpools()
+_blocking_limiter: CapacityLimiter | None = None
+
+
+def threadpool_size() -> int:
+    return settings.THREADPOOL_SIZE or (
+        settings.POSTGRES_POOL_SIZE + settings.POSTGRES_MAX_OVERFLOW
+    )
+
+
+def blocking_threadpool_size() -> int:
+    return settings.BLOCKING_THREADPOOL_SIZE or os.cpu_count() or 1
+
+
+def configure_threadpools() -> None:
+    """
+    Size the threadpool of the running event loop, instead of the 40 threads
+    of AnyIO. More threads than database connections would only wait for one
+    of them.
+    """
+    global _blocking_limiter
+    to_thread.current_default_thread_limiter().total_tokens = threadpool_size()
+    _blocking_limiter = CapacityLimiter(blocking_threadpool_size())
+
+
+def get_blocking_limiter() -> CapacityLimiter:
+    global _blocking_limiter
+    if _blocking_limiter is None:
+        _blocking_limiter = CapacityLimiter(blocking_threadpool_size())
+    return _blocking_limiter
+
+
+async def run_blocking(func: Callable[..., T], *args: Any) -> T:
+    """
+    Run blocking work that doesn't use the database in its own threads, so
+    that it doesn't hold the threads of the routes waiting for it.
+    """
+    return await to_thread.run_sync(func, *args, limiter=get_blocking_limiter())
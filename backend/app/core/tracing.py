@@ -0,0 +1,141 @@
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any
+
+from app.core.config import settings
+
+
+class RequestRate:
+    """
+    Requests per second in this process, over a sliding window.
+    """
+
+    def __init__(self, window: float = 10.0) -> None:
+        self.window = window
+        self.window_start = time.monotonic()
+        self.count = 0
+        self.previous_count = 0
+        self.lock = threading.Lock()
+
+    def _advance(self, now: float) -> None:
+        elapsed = now - self.window_start
+        if elapsed >= self.window:
+            self.previous_count = self.count if elapsed < 2 * self.window else 0
+            self.count = 0
+            self.window_start += self.window * (elapsed // self.window)
+
+    def hit(self) -> None:
+        with self.lock:
+            self._advance(time.monotonic())
+            self.count += 1
+
+    def per_second(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self._advance(now)
+            # Weight the previous window by how much it still overlaps
+            overlap = 1 - (now - self.window_start) / self.window
+            return (self.previous_count * overlap + self.count) / self.window
+
+
+request_rate = RequestRate()
+
+
+def route_sample_rate(path: str) -> float:
+    """
+    The rate of the longest matching path prefix in
+    SENTRY_TRACES_ROUTE_SAMPLE_RATES, or SENTRY_TRACES_SAMPLE_RATE.
+    """
+    matches = [
+        prefix
+        for prefix in settings.SENTRY_TRACES_ROUTE_SAMPLE_RATES
+        if path.startswith(prefix)
+    ]
+    if not matches:
+        return settings.SENTRY_TRACES_SAMPLE_RATE
+    return settings.SENTRY_TRACES_ROUTE_SAMPLE_RATES[max(matches, key=len)]
+
+
+def adaptive_sample_rate(rate: float) -> float:
+    """
+    Reduce the rate when the request volume would send more than
+    SENTRY_TRACES_MAX_PER_SECOND transactions.
+    """
+    requests_per_second = request_rate.per_second()
+    if not requests_per_second:
+        return rate
+    return min(rate, settings.SENTRY_TRACES_MAX_PER_SECOND / requests_per_second)
+
+
+def record_rate(path: str) -> float:
+    """
+    The share of the requests of the route that are traced: its sample rate
+    and, on top, SENTRY_TRACES_OUTLIER_RATE to find some of the errors and
+    slow requests not in the sample. Both are reduced when the volume spikes.
+    """
+    rate = route_sample_rate(path)
+    if not rate:
+        return 0.0
+    outlier_rate = adaptive_sample_rate(settings.SENTRY_TRACES_OUTLIER_RATE)
+    return min(1.0, adaptive_sample_rate(rate) + outlier_rate)
+
+
+def traces_sampler(sampling_context: dict[str, Any]) -> float:
+    """
+    Decide which requests are traced when they start, only slightly more
+    than the ones sent, so that `before_send_transaction` can keep the errors
+    and slow ones among them once they finish.
+
+    The errors themselves are always reported as events, with the id of
+    their trace whether it's sampled or not.
+    """
+    parent_sampled = sampling_context.get("parent_sampled")
+    if parent_sampled is not None:
+        return float(parent_sampled)
+    scope = sampling_context.get("asgi_scope")
+    if scope is None or scope.get("type") != "http":
+        return settings.SENTRY_TRACES_SAMPLE_RATE
+    path = scope.get("path", "")
+    if not route_sample_rate(path):
+        return 0.0
+    request_rate.hit()
+    return record_rate(path)
+
+
+def get_duration_ms(event: dict[str, Any]) -> float:
+    start, end = event.get("start_timestamp"), event.get("timestamp")
+    if isinstance(start, datetime) and isinstance(end, datetime):
+        return (end - start).total_seconds() * 1000
+    if isinstance(start, int | float) and isinstance(end, int | float):
+        return (end - start) * 1000
+    return 0.0
+
+
+def is_error(event: dict[str, Any]) -> bool:
+    contexts = event.get("contexts", {})
+    status_code = contexts.get("response", {}).get("status_code")
+    if status_code is not None:
+        return bool(status_code >= 500)
+    return contexts.get("trace", {}).get("status") not in (None, "ok")
+
+
+def before_send_transaction(
+    event: dict[str, Any], _hint: dict[str, Any]
+) -> dict[str, Any] | None:
+    """
+    Always send the transactions of errors and slow requests, and only a
+    sample of the rest, by route and reduced when the volume spikes.
+    """
+    if is_error(event):
+        return event
+    if get_duration_ms(event) >= settings.SENTRY_TRACES_SLOW_REQUEST_MS:
+        return event
+    path = event.get("transaction", "")
+    recorded = record_rate(path)
+    if not recorded:
+        return None
+    rate = adaptive_sample_rate(route_sample_rate(path))
+    # Drop the outliers headroom, the requests were recorded at a higher rate
+    return event if random.random() < rate / recorded else None
@@ -1,15 +1,49 @@
 import uuid
+from functools import lru_cache
 from typing import Any
 
-from sqlmodel import Session, select
+from sqlalchemy import (
+    ColumnElement,
+    Engine,
+    and_,
+    func,
+    literal_column,
+    or_,
+    text,
+    union,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Mapped
+from sqlmodel import Session, col, select
+from sqlmodel.sql.expression import Select, SelectOfScalar
 
-from app.core.security import get_password_hash, verify_password
-from app.models import Item, ItemCreate, User, UserCreate, UserUpdate
+from app.core.security import get_password_hash, get_password_hashes, verify_password
+from app.models import (
+    EmailBroadcast,
+    EmailBroadcastCreate,
+    EmailOutbox,
+    Item,
+    ItemCreate,
+    ItemsFilter,
+    User,
+    UserCreate,
+    UserUpdate,
+)
+from app.utils import EmailData
 
 
-def create_user(*, session: Session, user_create: UserCreate) -> User:
+def create_user(
+    *, session: Session, user_create: UserCreate, hashed_password: str | None = None
+) -> User:
+    """
+    The password is hashed here, unless it was hashed beforehand.
+    """
     db_obj = User.model_validate(
-        user_create, update={"hashed_password": get_password_hash(user_create.password)}
+        user_create,
+        update={
+            "hashed_password": hashed_password
+            or get_password_hash(user_create.password)
+        },
     )
     session.add(db_obj)
     session.commit()
@@ -17,13 +51,110 @@ def create_user(*, session: Session, user_create: UserCreate) -> User:
     return db_obj
 
 
-def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
+def create_users(
+    *,
+    session: Session,
+    users_create: list[UserCreate],
+    hashed_passwords: list[str] | None = None,
+    parallel_hashing: bool = False,
+) -> tuple[list[User], list[str]]:
+    """
+    Insert the users in a single statement, skipping the emails already
+    registered or repeated. Returns the users created and the emails skipped.
+    `hashed_passwords`, in the order of the users, are the passwords hashed
+    beforehand. Otherwise only those of the new users are hashed here, in a
+    pool of processes if `parallel_hashing`.
+    """
+    # Index of the first user of each email
+    first_index: dict[str, int] = {}
+    for i, user_create in enumerate(users_create):
+        first_index.setdefault(user_create.email, i)
+    # Don't hash the passwords of the users that already exist
+    existing = session.exec(
+        select(User.email).where(col(User.email).in_(first_index))
+    ).all()
+    for email in existing:
+        del first_index[email]
+    new_indexes = list(first_index.values())
+    new_users = [users_create[i] for i in new_indexes]
+    if hashed_passwords is None:
+        hashes = get_password_hashes(
+            [user_create.password for user_create in new_users],
+            parallel=parallel_hashing,
+        )
+    else:
+        hashes = [hashed_passwords[i] for i in new_indexes]
+    created: list[User] = []
+    if new_users:
+        rows = [
+            User.model_validate(
+                user_create, update={"hashed_password": hashed_password}
+            ).model_dump()
+            for user_create, hashed_password in zip(new_users, hashes, strict=True)
+        ]
+        # Users registered meanwhile by another request are skipped too
+        statement = (
+            insert(User)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["email"])
+            .returning(User)
+        )
+        created = list(session.scalars(statement))
+        session.commit()
+    created_emails = {user.email for user in created}
+    skipped = [
+        user_create.email
+        for i, user_create in enumerate(users_create)
+        if first_index.get(user_create.email) != i
+        or user_create.email not in created_emails
+    ]
+    return created, skipped
+
+
+def users_search_statement(query: str, limit: int) -> Select[Any]:
+    """
+    Up to `limit` users whose email or full name starts with the query,
+    ignoring case. Each column is read in the order of its prefix index, so
+    that the scans stop after `limit` matches.
+    """
+    branches = [
+        select(User.id, User.email, User.full_name)
+        .where(func.lower(column).startswith(query.lower(), autoescape=True))
+        # The order of the text_pattern_ops index
+        .order_by(literal_column(f"lower({name}) USING ~<~"))
+        .limit(limit)
+        for name, column in [
+            ("email", col(User.email)),
+            ("full_name", col(User.full_name)),
+        ]
+    ]
+    matches = union(*branches).subquery()
+    return (
+        select(matches.c.id, matches.c.email, matches.c.full_name)
+        .order_by(func.lower(matches.c.email))
+        .limit(limit)
+    )
+
+
+def search_users(*, session: Session, query: str, limit: int) -> list[Any]:
+    return list(session.exec(users_search_statement(query, limit)).all())
+
+
+def update_user(
+    *,
+    session: Session,
+    db_user: User,
+    user_in: UserUpdate,
+    hashed_password: str | None = None,
+) -> Any:
+    """
+    A new password is hashed here, unless it was hashed beforehand.
+    """
     user_data = user_in.model_dump(exclude_unset=True)
     extra_data = {}
     if "password" in user_data:
         password = user_data["password"]
-        hashed_password = get_password_hash(password)
-        extra_data["hashed_password"] = hashed_password
+        extra_data["hashed_password"] = hashed_password or get_password_hash(password)
     db_user.sqlmodel_update(user_data, update=extra_data)
     session.add(db_user)
     session.commit()
@@ -52,3 +183,125 @@ def create_item(*, session: Session, item_in: ItemCreate, owner_id: uuid.UUID) -
     session.commit()
     session.refresh(db_item)
     return db_item
+
+
+def item_conditions(filters: ItemsFilter) -> list[ColumnElement[bool]]:
+    conditions = []
+    if filters.owner_id:
+        conditions.append(col(Item.owner_id) == filters.owner_id)
+    if filters.title:
+        conditions.append(col(Item.title).startswith(filters.title, autoescape=True))
+    if filters.has_description is not None:
+        description = col(Item.description)
+        conditions.append(
+            description.is_not(None)
+            if filters.has_description
+            else description.is_(None)
+        )
+    if filters.created_after:
+        conditions.append(col(Item.created_at) >= filters.created_after)
+    if filters.created_before:
+        conditions.append(col(Item.created_at) < filters.created_before)
+    return conditions
+
+
+def items_statement(filters: ItemsFilter) -> SelectOfScalar[Item]:
+    """
+    The filtered and sorted items, the id breaks the ties so that the order
+    is stable. Each sort has an index, with and without the owner.
+    """
+    column: Mapped[Any] = col(Item.created_at)
+    if filters.sort.endswith("title"):
+        column = col(Item.title)
+    if filters.sort.startswith("-"):
+        order_by = [column.desc(), col(Item.id).desc()]
+    else:
+        order_by = [column.asc(), col(Item.id).asc()]
+    return select(Item).where(*item_conditions(filters)).order_by(*order_by)
+
+
+def get_items(
+    *, session: Session, filters: ItemsFilter, skip: int = 0, limit: int = 100
+) -> tuple[list[Item], int]:
+    count_statement = (
+        select(func.count()).select_from(Item).where(*item_conditions(filters))
+    )
+    count = session.exec(count_statement).one()
+    items = session.exec(items_statement(filters).offset(skip).limit(limit)).all()
+    return list(items), count
+
+
+@lru_cache
+def has_extension(bind: Engine, name: str) -> bool:
+    with bind.connect() as connection:
+        statement = text("SELECT 1 FROM pg_extension WHERE extname = :name")
+        return connection.execute(statement, {"name": name}).first() is not None
+
+
+def search_items(
+    *,
+    session: Session,
+    query: str,
+    owner_id: uuid.UUID | None = None,
+    after: tuple[float, uuid.UUID] | None = None,
+    limit: int = 100,
+) -> list[tuple[Item, float]]:
+    """
+    The items matching the words of the query, or with a title similar to
+    it if pg_trgm is installed, by descending rank. `after` is the rank and
+    id of the last item of the previous page.
+    """
+    ts_query = func.websearch_to_tsquery(literal_column("'english'"), query)
+    search_vector = col(Item.search_vector)
+    rank: ColumnElement[float] = func.ts_rank_cd(search_vector, ts_query)
+    matches: ColumnElement[bool] = search_vector.op("@@")(ts_query)
+    if has_extension(session.get_bind(), "pg_trgm"):
+        rank = rank + func.similarity(col(Item.title), query)
+        matches = or_(matches, col(Item.title).op("%")(query))
+    statement = select(Item, rank).where(matches)
+    if owner_id:
+        statement = statement.where(Item.owner_id == owner_id)
+    if after:
+        after_rank, after_id = after
+        statement = statement.where(
+            or_(rank < after_rank, and_(rank == after_rank, col(Item.id) > after_id))
+        )
+    statement = statement.order_by(rank.desc(), col(Item.id)).limit(limit)
+    return list(session.exec(statement).all())
+
+
+def enqueue_email(
+    *, session: Session, email_to: str, subject: str, html_content: str
+) -> EmailOutbox:
+    db_email = EmailOutbox(
+        email_to=email_to, subject=subject, html_content=html_content
+    )
+    session.add(db_email)
+    session.commit()
+    session.refresh(db_email)
+    return db_email
+
+
+def enqueue_emails(*, session: Session, emails: dict[str, EmailData]) -> None:
+    """
+    Queue many emails, by recipient, in a single transaction.
+    """
+    session.add_all(
+        EmailOutbox(
+            email_to=email_to,
+            subject=email_data.subject,
+            html_content=email_data.html_content,
+        )
+        for email_to, email_data in emails.items()
+    )
+    session.commit()
+
+
+def create_email_broadcast(
+    *, session: Session, broadcast_in: EmailBroadcastCreate
+) -> EmailBroadcast:
+    db_broadcast = EmailBroadcast.model_validate(broadcast_in)
+    session.add(db_broadcast)
+    session.commit()
+    session.refresh(db_broadcast)
+    return db_broadcast
@@ -0,0 +1,323 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy import Row, or_, update
+from sqlmodel import Session, col, func, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import EmailBroadcast, EmailOutbox, User, utc_now
+from app.utils import get_smtp_backend, render_email_template, send_email
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Space out calls to `wait()` to at most `rate` per second, across threads.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            send_time = max(self.next_time, now)
+            self.next_time = send_time + self.interval
+        time.sleep(send_time - now)
+
+
+class SMTPConnectionPool:
+    """
+    One SMTP connection per sending thread, reused for all its emails.
+    """
+
+    def __init__(self) -> None:
+        self.local = threading.local()
+        self.backends: list[Any] = []
+        self.lock = threading.Lock()
+
+    def get(self) -> Any:
+        backend = getattr(self.local, "backend", None)
+        if backend is None:
+            backend = self.local.backend = get_smtp_backend()
+            with self.lock:
+                self.backends.append(backend)
+        return backend
+
+    def close(self) -> None:
+        for backend in self.backends:
+            backend.close()
+        self.backends.clear()
+
+
+def claim_broadcast(*, session: Session) -> EmailBroadcast | None:
+    """
+    Take a broadcast not finished and not leased by another worker, either
+    new or left behind by a worker that crashed.
+    """
+    now = utc_now()
+    statement = (
+        select(EmailBroadcast)
+        .where(col(EmailBroadcast.status).in_(["pending", "running"]))
+        .where(
+            or_(
+                col(EmailBroadcast.locked_until).is_(None),
+                col(EmailBroadcast.locked_until) < now,
+            )
+        )
+        .order_by(col(EmailBroadcast.created_at))
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    broadcast = session.exec(statement).first()
+    if broadcast:
+        broadcast.status = "running"
+        broadcast.locked_until = now + timedelta(seconds=settings.EMAIL_BROADCAST_LEASE)
+        broadcast.lease_owner = uuid.uuid4()
+        session.add(broadcast)
+        session.commit()
+        session.refresh(broadcast)
+    else:
+        session.commit()
+    return broadcast
+
+
+def update_leased_broadcast(
+    *,
+    session: Session,
+    broadcast_id: uuid.UUID,
+    lease_owner: uuid.UUID | None,
+    values: dict[str, Any],
+) -> bool:
+    """
+    Update the broadcast in the transaction of the session if the worker
+    still holds its lease, False if another worker took it over.
+    """
+    result = session.execute(
+        update(EmailBroadcast)
+        .where(col(EmailBroadcast.id) == broadcast_id)
+        .where(col(EmailBroadcast.lease_owner) == lease_owner)
+        .values(values)
+    )
+    return bool(result.rowcount)  # type: ignore[attr-defined]
+
+
+class LeaseRenewer:
+    """
+    Extend the lease of a broadcast from a thread every third of
+    EMAIL_BROADCAST_LEASE, however long a chunk takes at the rate limit, as
+    long as emails were sent since the last time. A worker stuck sending
+    loses the lease, and another one takes the broadcast over.
+    """
+
+    def __init__(self, broadcast_id: uuid.UUID, lease_owner: uuid.UUID | None) -> None:
+        self.broadcast_id = broadcast_id
+        self.lease_owner = lease_owner
+        self.progressed = threading.Event()
+        # Set once another worker holds the lease
+        self.lost = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self) -> "LeaseRenewer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def progress(self) -> None:
+        self.progressed.set()
+
+    def run(self) -> None:
+        while not self.stopped.wait(settings.EMAIL_BROADCAST_LEASE / 3):
+            if not self.progressed.is_set():
+                logger.warning(
+                    f"No email of {self.broadcast_id} sent, lease not renewed"
+                )
+                continue
+            self.progressed.clear()
+            try:
+                with Session(engine) as session:
+                    renewed = update_leased_broadcast(
+                        session=session,
+                        broadcast_id=self.broadcast_id,
+                        lease_owner=self.lease_owner,
+                        values={
+                            "locked_until": utc_now()
+                            + timedelta(seconds=settings.EMAIL_BROADCAST_LEASE)
+                        },
+                    )
+                    session.commit()
+            except Exception:
+                logger.exception(f"Error renewing the lease of {self.broadcast_id}")
+                continue
+            if not renewed:
+                logger.warning(f"Lease of {self.broadcast_id} taken by another worker")
+                self.lost.set()
+                return
+
+
+def fetch_recipients(
+    *, session: Session, after: str | None
+) -> list[Row[tuple[str, str | None]]]:
+    """
+    The next chunk of active users in email order, read in a short
+    transaction rather than one left open for the whole broadcast.
+    """
+    statement = (
+        select(User.email, User.full_name)
+        .where(col(User.is_active))
+        .order_by(col(User.email))
+        .limit(settings.EMAIL_BROADCAST_CHUNK_SIZE)
+    )
+    if after:
+        statement = statement.where(col(User.email) > after)
+    recipients = list(session.connection().execute(statement).all())
+    session.commit()
+    return recipients
+
+
+def send_broadcast(
+    *, session: Session, broadcast: EmailBroadcast, stop_event: threading.Event
+) -> None:
+    """
+    Send the broadcast to the active users in chunks, in email order, saving
+    the progress after each chunk. It stops once another worker took over
+    the lease, without saving the progress of the chunk.
+
+    A crash can send the emails of the current chunk again when resuming.
+    """
+    if broadcast.total_recipients is None:
+        broadcast.total_recipients = session.exec(
+            select(func.count()).select_from(User).where(col(User.is_active))
+        ).one()
+        session.add(broadcast)
+        session.commit()
+    # Read now, the instance is expired on each commit
+    broadcast_id, lease_owner = broadcast.id, broadcast.lease_owner
+    subject, content = broadcast.subject, broadcast.content
+    last_email = broadcast.last_email
+
+    limiter = RateLimiter(settings.EMAIL_BROADCAST_RATE_LIMIT)
+    pool = SMTPConnectionPool()
+    renewer = LeaseRenewer(broadcast_id, lease_owner)
+
+    def deliver(recipient: Row[tuple[str, str | None]]) -> str | None:
+        """
+        Send the email, returning its content if it couldn't be sent.
+        """
+        html_content = render_email_template(
+            template_name="broadcast.html",
+            context={
+                "project_name": settings.PROJECT_NAME,
+                "email": recipient.email,
+                "full_name": recipient.full_name,
+                "content": content,
+            },
+        )
+        limiter.wait()
+        try:
+            sent = send_email(
+                email_to=recipient.email,
+                subject=subject,
+                html_content=html_content,
+                smtp=pool.get(),
+            )
+        except Exception:
+            logger.exception(f"Error sending broadcast to {recipient.email}")
+            sent = False
+        renewer.progress()
+        return None if sent else html_content
+
+    stopped = False
+    try:
+        with (
+            renewer,
+            ThreadPoolExecutor(settings.EMAIL_BROADCAST_CONCURRENCY) as executor,
+        ):
+            while not (stopped := stop_event.is_set() or renewer.lost.is_set()):
+                chunk = fetch_recipients(session=session, after=last_email)
+                if not chunk:
+                    break
+                failed = {
+                    recipient.email: html_content
+                    for recipient, html_content in zip(
+                        chunk, executor.map(deliver, chunk), strict=True
+                    )
+                    if html_content is not None
+                }
+                # Retried with backoff by the email outbox worker, queued in
+                # the transaction of the checkpoint
+                session.add_all(
+                    EmailOutbox(
+                        email_to=email_to, subject=subject, html_content=html_content
+                    )
+                    for email_to, html_content in failed.items()
+                )
+                last_email = chunk[-1].email
+                if not update_leased_broadcast(
+                    session=session,
+                    broadcast_id=broadcast_id,
+                    lease_owner=lease_owner,
+                    values={
+                        "sent_count": col(EmailBroadcast.sent_count)
+                        + len(chunk)
+                        - len(failed),
+                        "failed_count": col(EmailBroadcast.failed_count) + len(failed),
+                        "last_email": last_email,
+                    },
+                ):
+                    session.rollback()
+                    logger.warning(f"Broadcast {broadcast_id} taken by another worker")
+                    return
+                session.commit()
+                logger.info(
+                    f"Broadcast {broadcast_id}: {broadcast.sent_count} sent, "
+                    f"{broadcast.failed_count} failed of "
+                    f"{broadcast.total_recipients}"
+                )
+    finally:
+        pool.close()
+    values: dict[str, Any] = {"locked_until": None, "lease_owner": None}
+    if not stopped:
+        values |= {"status": "completed", "finished_at": utc_now()}
+    # Once stopped, another worker can resume it right away
+    if update_leased_broadcast(
+        session=session,
+        broadcast_id=broadcast_id,
+        lease_owner=lease_owner,
+        values=values,
+    ):
+        session.commit()
+    else:
+        session.rollback()
+        logger.warning(f"Broadcast {broadcast_id} taken by another worker")
+
+
+def run(stop_event: threading.Event) -> None:
+    while not stop_event.is_set():
+        try:
+            with Session(engine) as session:
+                broadcast = claim_broadcast(session=session)
+                if broadcast:
+                    logger.info(f"Sending broadcast {broadcast.id}")
+                    send_broadcast(
+                        session=session, broadcast=broadcast, stop_event=stop_event
+                    )
+                    continue
+        except Exception:
+            logger.exception("Error sending email broadcast")
+        stop_event.wait(settings.EMAIL_OUTBOX_POLL_INTERVAL)
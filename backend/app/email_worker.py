@@ -0,0 +1,123 @@
+import logging
+import random
+import signal
+import threading
+from collections.abc import Sequence
+from datetime import timedelta
+from types import FrameType
+
+from sqlmodel import Session, col, select
+
+from app import email_broadcast
+from app.core.config import settings
+from app.core.db import engine
+from app.core.logs import setup_logging
+from app.models import EmailOutbox, utc_now
+from app.utils import get_smtp_backend, precompile_email_templates, send_email
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    # Exponential backoff with jitter, so that failed emails don't all come
+    # back at the same time
+    delay = min(
+        settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.EMAIL_OUTBOX_MAX_RETRY_DELAY,
+    )
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_pending_emails(*, session: Session, limit: int) -> Sequence[EmailOutbox]:
+    # SKIP LOCKED lets several workers take different batches concurrently
+    statement = (
+        select(EmailOutbox)
+        .where(EmailOutbox.status == "pending")
+        .where(col(EmailOutbox.next_attempt_at) <= utc_now())
+        .order_by(col(EmailOutbox.next_attempt_at))
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return session.exec(statement).all()
+
+
+def process_outbox_batch(*, session: Session) -> int:
+    """
+    Send a batch of pending emails through a single SMTP connection and
+    record the result of each one. Returns the number of emails processed.
+    """
+    batch = claim_pending_emails(
+        session=session, limit=settings.EMAIL_OUTBOX_BATCH_SIZE
+    )
+    if not batch:
+        session.commit()
+        return 0
+    with get_smtp_backend() as smtp:
+        for email in batch:
+            email.attempts += 1
+            try:
+                sent = send_email(
+                    email_to=email.email_to,
+                    subject=email.subject,
+                    html_content=email.html_content,
+                    smtp=smtp,
+                )
+                error = None if sent else "SMTP server rejected the email"
+            except Exception as e:
+                logger.exception(f"Error sending email {email.id}")
+                sent, error = False, str(e)
+            if sent:
+                email.status = "sent"
+                email.sent_at = utc_now()
+                email.last_error = None
+            else:
+                email.last_error = error and error[:1024]
+                if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    email.status = "failed"
+                else:
+                    email.next_attempt_at = utc_now() + retry_delay(email.attempts)
+            session.add(email)
+    session.commit()
+    return len(batch)
+
+
+def run(stop_event: threading.Event) -> None:
+    while not stop_event.is_set():
+        try:
+            with Session(engine) as session:
+                processed = process_outbox_batch(session=session)
+        except Exception:
+            logger.exception("Error processing the email outbox")
+            processed = 0
+        # Keep going while there are full batches, otherwise wait for more
+        if processed < settings.EMAIL_OUTBOX_BATCH_SIZE:
+            stop_event.wait(settings.EMAIL_OUTBOX_POLL_INTERVAL)
+
+
+def main() -> None:
+    setup_logging()
+    stop_event = threading.Event()
+
+    def handle_exit(_signum: int, _frame: FrameType | None) -> None:
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_exit)
+    signal.signal(signal.SIGINT, handle_exit)
+    if not settings.emails_enabled:
+        # Left idle rather than exiting, it would only be restarted without
+        # the SMTP configuration
+        logger.warning("No SMTP server configured, no email will be sent")
+        stop_event.wait()
+        return
+    precompile_email_templates()
+    logger.info("Starting email outbox worker")
+    # Broadcasts are sent in parallel, so they don't delay the other emails
+    broadcasts = threading.Thread(target=email_broadcast.run, args=(stop_event,))
+    broadcasts.start()
+    run(stop_event)
+    broadcasts.join()
+    logger.info("Email outbox worker stopped")
+
+
+if __name__ == "__main__":
+    main()
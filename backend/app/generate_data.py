@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import logging
+import random
+import string
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from sqlmodel import Session
+
+from app.core.db import engine, init_db
+from app.core.logs import setup_logging
+from app.core.security import get_pwd_context
+
+logger = logging.getLogger(__name__)
+
+# Emails of the generated users start with this, to tell them apart
+EMAIL_PREFIX = "synthetic-"
+# Rows generated and copied by each task, the random generator of each chunk
+# is seeded from its position, so the data doesn't depend on the processes
+chunk_size = 50_000
+
+FIRST_NAMES = (
+    "Ada Alan Alice Ana Bob Carlos Chen Dara Elena Fatima Grace Hana Ivan "
+    "James Julia Kenji Lars Leila Maria Mateo Nadia Omar Priya Sara Tom Yuki"
+).split()
+LAST_NAMES = (
+    "Adams Costa Dubois Garcia Hansen Ivanova Kim Kowalski Lee Lopez Martin "
+    "Meyer Nakamura Novak Okafor Patel Rossi Schmidt Silva Smith Tanaka Wang"
+).split()
+WORDS = (
+    "alpha beta budget client design draft event final guide invoice launch "
+    "meeting notes order plan project report review roadmap sales summary "
+    "task team travel update"
+).split()
+
+
+def generated_uuid(seed: int, kind: str, index: int) -> uuid.UUID:
+    digest = hashlib.blake2b(f"{seed}:{kind}:{index}".encode(), digest_size=16)
+    return uuid.UUID(bytes=digest.digest(), version=4)
+
+
+def generated_email(index: int) -> str:
+    return f"{EMAIL_PREFIX}{index}@example.com"
+
+
+def password_hashes(seed: int, count: int) -> list[str]:
+    """
+    Hash `count` passwords ("password-0", "password-1", ...) once, to be
+    shared by all the users. The salts come from the seed, so the hashes are
+    the same on each run.
+    """
+    rng = random.Random(seed)
+    bcrypt = get_pwd_context().handler("bcrypt")
+    salt_chars = "./" + string.ascii_letters + string.digits
+    hashes = []
+    for i in range(count):
+        # The last character of a bcrypt salt only has 2 significant bits
+        salt = "".join(rng.choices(salt_chars, k=21)) + "."
+        hashes.append(bcrypt.using(salt=salt).hash(f"password-{i}"))
+    return hashes
+
+
+def chunk_rng(seed: int, kind: str, start: int) -> random.Random:
+    return random.Random(f"{seed}:{kind}:{start}")
+
+
+def user_rows(
+    seed: int, start: int, stop: int, hashes: list[str]
+) -> Iterator[tuple[Any, ...]]:
+    rng = chunk_rng(seed, "user", start)
+    for i in range(start, stop):
+        full_name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        yield (
+            generated_uuid(seed, "user", i),
+            generated_email(i),
+            # Some accounts are deactivated
+            rng.random() > 0.02,
+            False,
+            full_name,
+            hashes[i % len(hashes)],
+        )
+
+
+def item_rows(
+    seed: int, start: int, stop: int, users: int, owner_skew: float
+) -> Iterator[tuple[Any, ...]]:
+    """
+    Items of random owners, the skew makes a few users own most of the items
+    (1 is uniform), as in real data.
+    """
+    rng = chunk_rng(seed, "item", start)
+    for i in range(start, stop):
+        owner = int(users * rng.random() ** owner_skew)
+        title = " ".join(rng.choices(WORDS, k=rng.randint(1, 4))).capitalize()
+        description = (
+            " ".join(rng.choices(WORDS, k=rng.randint(3, 20)))
+            if rng.random() > 0.2
+            else None
+        )
+        yield (
+            generated_uuid(seed, "item", i),
+            title,
+            description,
+            generated_uuid(seed, "user", owner),
+        )
+
+
+def copy_users(start: int, stop: int, seed: int, hashes: list[str]) -> int:
+    with engine.begin() as connection:
+        dbapi_connection = connection.connection.driver_connection
+        with dbapi_connection.cursor() as cursor:  # type: ignore[union-attr]
+            with cursor.copy(
+                'COPY "user" (id, email, is_active, is_superuser, full_name, '
+                "hashed_password) FROM STDIN"
+            ) as copy:
+                for row in user_rows(seed, start, stop, hashes):
+                    copy.write_row(row)
+    return stop - start
+
+
+def copy_items(start: int, stop: int, seed: int, users: int, owner_skew: float) -> int:
+    with engine.begin() as connection:
+        dbapi_connection = connection.connection.driver_connection
+        with dbapi_connection.cursor() as cursor:  # type: ignore[union-attr]
+            with cursor.copy(
+                "COPY item (id, title, description, owner_id) FROM STDIN"
+            ) as copy:
+                for row in item_rows(seed, start, stop, users, owner_skew):
+                    copy.write_row(row)
+    return stop - start
+
+
+def init_worker() -> None:
+    # Don't use the connections inherited from the parent process
+    engine.dispose(close=False)
+
+
+def copy_in_chunks(
+    executor: ProcessPoolExecutor,
+    kind: str,
+    copy_chunk: Callable[..., int],
+    total: int,
+    *args: Any,
+) -> None:
+    start_time = time.perf_counter()
+    futures = [
+        executor.submit(copy_chunk, start, min(start + chunk_size, total), *args)
+        for start in range(0, total, chunk_size)
+    ]
+    copied = sum(future.result() for future in futures)
+    elapsed = time.perf_counter() - start_time
+    logger.info(
+        f"Copied {copied} {kind} in {elapsed:.1f} s "
+        f"({copied / max(elapsed, 1e-9):.0f} rows/s)"
+    )
+
+
+def generate(
+    *,
+    users: int,
+    items: int,
+    seed: int = 0,
+    workers: int = 4,
+    passwords: int = 10,
+    owner_skew: float = 2.0,
+) -> None:
+    hashes = password_hashes(seed, passwords)
+    with ProcessPoolExecutor(workers, initializer=init_worker) as executor:
+        # The users first, the items reference them
+        copy_in_chunks(executor, "users", copy_users, users, seed, hashes)
+        copy_in_chunks(executor, "items", copy_items, items, seed, users, owner_skew)
+
+
+def main() -> None:
+    setup_logging()
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic users and items with COPY"
+    )
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--passwords",
+        type=int,
+        default=10,
+        help="Distinct passwords, password-0, password-1, ... hashed once",
+    )
+    parser.add_argument(
+        "--owner-skew",
+        type=float,
+        default=2.0,
+        help="How concentrated the items are in a few users, 1 is uniform",
+    )
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        init_db(session)
+    logger.info(f"Generating {args.users} users and {args.items} items")
+    generate(
+        users=args.users,
+        items=args.items,
+        seed=args.seed,
+        workers=args.workers,
+        passwords=args.passwords,
+        owner_skew=args.owner_skew,
+    )
+
+
+if __name__ == "__main__":
+    main()
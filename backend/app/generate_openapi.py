@@ -0,0 +1,24 @@
+import logging
+import sys
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.logs import setup_logging
+from app.core.openapi import serialize_openapi, write_openapi_file
+from app.main import app
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    setup_logging()
+    target = sys.argv[1] if len(sys.argv) > 1 else settings.OPENAPI_SCHEMA_FILE
+    if not target:
+        raise SystemExit("Pass a target path or set OPENAPI_SCHEMA_FILE")
+    logger.info(f"Writing OpenAPI schema to {target}")
+    write_openapi_file(serialize_openapi(app), Path(target))
+    logger.info("OpenAPI schema written")
+
+
+if __name__ == "__main__":
+    main()
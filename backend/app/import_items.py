@@ -0,0 +1,274 @@
+import argparse
+import codecs
+import csv
+import itertools
+import json
+import logging
+import uuid
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import IO, Any
+
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, delete, select
+
+from app.core.db import engine
+from app.core.ids import uuid7
+from app.core.logs import setup_logging
+from app.models import Item, ItemCreate, ItemImport, ItemImportRow, User, utc_now
+
+logger = logging.getLogger(__name__)
+
+
+def count_lines(file: IO[bytes], counter: list[int]) -> Iterator[str]:
+    # Count the bytes of the lines as they are read, the csv module can read
+    # several lines for a single row
+    for line in file:
+        counter[0] += len(line)
+        yield line.decode()
+
+
+def count_newlines(file: IO[bytes], end: int) -> int:
+    file.seek(0)
+    count = 0
+    while file.tell() < end and (chunk := file.read(min(end - file.tell(), 1 << 20))):
+        count += chunk.count(b"\n")
+    return count
+
+
+def read_records(
+    path: Path, *, file_format: str, offset: int = 0
+) -> Iterator[tuple[dict[str, Any] | str, int]]:
+    """
+    Stream the records of an NDJSON or CSV file from `offset`, with the
+    offset after each of them. The NDJSON lines that aren't a JSON object
+    are yielded as an error message with their line number instead, so they
+    are rejected and skipped like the invalid records.
+    """
+    with path.open("rb") as file:
+        # Skip the byte order mark of the files saved as UTF-8 by Excel, like
+        # the utf-8-sig codec, the offsets are in bytes
+        if file.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+            file.seek(0)
+        fieldnames = None
+        line_number = 0
+        if file_format == "csv":
+            fieldnames = next(csv.reader([file.readline().decode()]))
+        elif offset:
+            # Numbered from the start of the file, also when resuming
+            line_number = count_newlines(file, offset)
+        offset = max(offset, file.tell())
+        file.seek(offset)
+        counter = [offset]
+        lines = count_lines(file, counter)
+        if fieldnames is not None:
+            for row in csv.DictReader(lines, fieldnames=fieldnames):
+                yield row, counter[0]
+        else:
+            for line in lines:
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield f"Line {line_number}: invalid JSON: {e}", counter[0]
+                    continue
+                if not isinstance(record, dict):
+                    yield f"Line {line_number}: not a JSON object", counter[0]
+                    continue
+                yield record, counter[0]
+
+
+def validate_batch(
+    records: Iterable[dict[str, Any] | str],
+) -> tuple[list[tuple[ItemCreate, str]], list[str]]:
+    """
+    The valid items with their owner's email, and the errors of the others.
+    """
+    valid, errors = [], []
+    for record in records:
+        if isinstance(record, str):
+            errors.append(record)
+            continue
+        email = record.get("owner_email")
+        try:
+            item_in = ItemCreate.model_validate(record)
+        except ValidationError as e:
+            errors.append(f"{record!r}: {e.errors(include_url=False)}")
+            continue
+        if not email:
+            errors.append(f"{record!r}: missing owner_email")
+            continue
+        # Empty in the CSV files for the items without one
+        if not item_in.description:
+            item_in.description = None
+        valid.append((item_in, email))
+    return valid, errors
+
+
+def resolve_owners(
+    *, session: Session, emails: Iterable[str], owners: dict[str, uuid.UUID | None]
+) -> None:
+    """
+    Look up the ids of the emails not already in `owners`, in one query.
+    """
+    missing = set(emails) - owners.keys()
+    if not missing:
+        return
+    found = session.exec(
+        select(User.email, User.id).where(col(User.email).in_(missing))
+    ).all()
+    owners.update(dict.fromkeys(missing))
+    owners.update(dict(found))
+
+
+def stage_rows(
+    *, session: Session, import_id: uuid.UUID, rows: list[tuple[ItemCreate, uuid.UUID]]
+) -> None:
+    dbapi_connection = session.connection().connection.driver_connection
+    with dbapi_connection.cursor() as cursor:  # type: ignore[union-attr]
+        with cursor.copy(
+            "COPY item_import_row (id, import_id, title, description, owner_id) "
+            "FROM STDIN"
+        ) as copy:
+            for item_in, owner_id in rows:
+                copy.write_row(
+                    (
+                        uuid7(),
+                        import_id,
+                        item_in.title,
+                        item_in.description,
+                        owner_id,
+                    )
+                )
+
+
+def merge_staged_rows(*, session: Session, item_import: ItemImport) -> int:
+    """
+    Insert all the staged rows in the item table in a single statement,
+    skipping those whose owner has been deleted since.
+    """
+    staged = (
+        select(
+            ItemImportRow.id,
+            ItemImportRow.title,
+            ItemImportRow.description,
+            ItemImportRow.owner_id,
+        )
+        .join(User, col(User.id) == ItemImportRow.owner_id)
+        .where(ItemImportRow.import_id == item_import.id)
+    )
+    statement = (
+        insert(Item)
+        .from_select(["id", "title", "description", "owner_id"], staged)
+        .on_conflict_do_nothing(index_elements=["id"])
+    )
+    result = session.execute(statement, execution_options={"preserve_rowcount": True})
+    imported: int = result.rowcount  # type: ignore[attr-defined]
+    session.execute(
+        delete(ItemImportRow).where(col(ItemImportRow.import_id) == item_import.id)
+    )
+    item_import.status = "completed"
+    item_import.rows_imported = imported
+    item_import.finished_at = utc_now()
+    session.add(item_import)
+    session.commit()
+    return imported
+
+
+def get_or_create_import(*, session: Session, source: str) -> ItemImport:
+    item_import = session.exec(
+        select(ItemImport)
+        .where(ItemImport.source == source)
+        .where(ItemImport.status == "running")
+    ).first()
+    if item_import:
+        logger.info(f"Resuming the import of {source} from byte {item_import.offset}")
+        return item_import
+    item_import = ItemImport(source=source)
+    session.add(item_import)
+    session.commit()
+    session.refresh(item_import)
+    return item_import
+
+
+def import_items(
+    path: Path,
+    *,
+    file_format: str,
+    batch_size: int = 10_000,
+    rejects: IO[str] | None = None,
+) -> ItemImport:
+    """
+    Validate and stage the file in batches, saving the offset reached with
+    each one, then merge all of them into the item table.
+    """
+    owners: dict[str, uuid.UUID | None] = {}
+    with Session(engine) as session:
+        item_import = get_or_create_import(session=session, source=str(path.resolve()))
+        records = read_records(path, file_format=file_format, offset=item_import.offset)
+        while batch := list(itertools.islice(records, batch_size)):
+            valid, errors = validate_batch(record for record, _ in batch)
+            resolve_owners(
+                session=session, emails=(email for _, email in valid), owners=owners
+            )
+            rows = []
+            for item_in, email in valid:
+                owner_id = owners[email]
+                if owner_id is None:
+                    errors.append(f"{item_in!r}: unknown owner {email}")
+                else:
+                    rows.append((item_in, owner_id))
+            stage_rows(session=session, import_id=item_import.id, rows=rows)
+            # Saved in the same transaction as the staged rows
+            item_import.offset = batch[-1][1]
+            item_import.rows_staged += len(rows)
+            item_import.rows_rejected += len(errors)
+            session.add(item_import)
+            session.commit()
+            if rejects:
+                rejects.writelines(f"{error}\n" for error in errors)
+            logger.info(
+                f"Staged {item_import.rows_staged} items, "
+                f"rejected {item_import.rows_rejected}"
+            )
+        imported = merge_staged_rows(session=session, item_import=item_import)
+        logger.info(f"Imported {imported} items")
+        session.refresh(item_import)
+        return item_import
+
+
+def main() -> None:
+    setup_logging()
+    parser = argparse.ArgumentParser(
+        description="Import items from an NDJSON or CSV file with the columns "
+        "title, description and owner_email. Run it again to resume an "
+        "interrupted import."
+    )
+    parser.add_argument("path", type=Path)
+    parser.add_argument(
+        "--format", choices=["ndjson", "csv"], help="By default from the extension"
+    )
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument(
+        "--rejects", type=Path, help="File where the rejected rows are written"
+    )
+    args = parser.parse_args()
+
+    file_format = args.format or ("csv" if args.path.suffix == ".csv" else "ndjson")
+    if args.rejects:
+        with args.rejects.open("a") as rejects:
+            import_items(
+                args.path,
+                file_format=file_format,
+                batch_size=args.batch_size,
+                rejects=rejects,
+            )
+    else:
+        import_items(args.path, file_format=file_format, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Heavy optional modules that should only be imported on first use
+LAZY_MODULES = ("emails", "jinja2", "sentry_sdk", "passlib", "bcrypt")
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+@dataclass
+class ImportTimeReport:
+    module: str
+    timings: list[ImportTiming]
+    loaded_lazy_modules: list[str]
+
+    @property
+    def total_ms(self) -> float:
+        for timing in reversed(self.timings):
+            if timing.module == self.module and timing.depth == 0:
+                return timing.cumulative_us / 1000
+        return 0.0
+
+    def slowest(self, count: int) -> list[ImportTiming]:
+        return sorted(self.timings, key=lambda t: t.cumulative_us, reverse=True)[:count]
+
+
+def measure_import_time(module: str = "app.main") -> ImportTimeReport:
+    """
+    Import `module` in a fresh interpreter with `-X importtime` and parse the
+    timings it reports.
+    """
+    code = (
+        f"import sys; import {module}; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=BACKEND_DIR,
+        check=True,
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        timings.append(
+            ImportTiming(
+                module=name,
+                self_us=int(self_us),
+                cumulative_us=int(cumulative_us),
+                depth=(len(indent) - 1) // 2,
+            )
+        )
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return ImportTimeReport(module=module, timings=timings, loaded_lazy_modules=loaded)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report the import time of the app")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument(
+        "--budget-ms", type=float, help="Exit with an error above this import time"
+    )
+    args = parser.parse_args()
+
+    report = measure_import_time(args.module)
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for timing in report.slowest(args.top):
+        print(
+            f"{timing.cumulative_us / 1000:>14.1f} {timing.self_us / 1000:>9.1f}  "
+            f"{'  ' * timing.depth}{timing.module}"
+        )
+    print(f"\nTotal import time of {args.module}: {report.total_ms:.1f} ms")
+    if report.loaded_lazy_modules:
+        print(f"Eagerly imported: {', '.join(report.loaded_lazy_modules)}")
+    if args.budget_ms is not None and report.total_ms > args.budget_ms:
+        sys.exit(f"Import time over the budget of {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
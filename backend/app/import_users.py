@@ -0,0 +1,116 @@
+import argparse
+import itertools
+import logging
+from pathlib import Path
+from typing import IO
+
+from pydantic import ValidationError
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.core.logs import setup_logging
+from app.import_items import read_records
+from app.models import UserCreate
+from app.utils import generate_new_account_emails
+
+logger = logging.getLogger(__name__)
+
+
+def import_users(
+    path: Path,
+    *,
+    file_format: str,
+    batch_size: int = 1000,
+    send_emails: bool = False,
+    skipped: IO[str] | None = None,
+) -> tuple[int, int, int]:
+    """
+    Create the users of the file in batches, hashing the passwords of each
+    batch in parallel. Returns the users created, skipped and rejected.
+    """
+    created_count = skipped_count = rejected_count = 0
+    records = (record for record, _ in read_records(path, file_format=file_format))
+    with Session(engine) as session:
+        while batch := list(itertools.islice(records, batch_size)):
+            users_create = []
+            for record in batch:
+                if isinstance(record, str):
+                    rejected_count += 1
+                    logger.warning(f"Invalid user: {record}")
+                    continue
+                # Empty CSV columns take the default values
+                values = {key: value for key, value in record.items() if value != ""}
+                try:
+                    users_create.append(UserCreate.model_validate(values))
+                except ValidationError as e:
+                    rejected_count += 1
+                    logger.warning(
+                        f"Invalid user {record.get('email')!r}: "
+                        f"{e.errors(include_url=False)}"
+                    )
+            created, skipped_emails = crud.create_users(
+                session=session, users_create=users_create, parallel_hashing=True
+            )
+            if send_emails and created:
+                emails = generate_new_account_emails(
+                    users_create, [user.email for user in created]
+                )
+                crud.enqueue_emails(session=session, emails=emails)
+            if skipped:
+                skipped.writelines(f"{email}\n" for email in skipped_emails)
+            created_count += len(created)
+            skipped_count += len(skipped_emails)
+            logger.info(
+                f"Created {created_count} users, skipped {skipped_count}, "
+                f"rejected {rejected_count}"
+            )
+    return created_count, skipped_count, rejected_count
+
+
+def main() -> None:
+    setup_logging()
+    parser = argparse.ArgumentParser(
+        description="Create users from an NDJSON or CSV file with the columns "
+        "email, password and optionally full_name, is_active and is_superuser. "
+        "The emails already registered are skipped."
+    )
+    parser.add_argument("path", type=Path)
+    parser.add_argument(
+        "--format", choices=["ndjson", "csv"], help="By default from the extension"
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--send-emails",
+        action="store_true",
+        help="Queue the new account emails in the outbox",
+    )
+    parser.add_argument(
+        "--skipped", type=Path, help="File where the skipped emails are written"
+    )
+    args = parser.parse_args()
+
+    if args.send_emails and not settings.emails_enabled:
+        parser.error("Emails are not configured")
+    file_format = args.format or ("csv" if args.path.suffix == ".csv" else "ndjson")
+    if args.skipped:
+        with args.skipped.open("a") as skipped:
+            import_users(
+                args.path,
+                file_format=file_format,
+                batch_size=args.batch_size,
+                send_emails=args.send_emails,
+                skipped=skipped,
+            )
+    else:
+        import_users(
+            args.path,
+            file_format=file_format,
+            batch_size=args.batch_size,
+            send_emails=args.send_emails,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,23 @@
-import sentry_sdk
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
+from app.core.admission import AdmissionControlMiddleware
 from app.core.config import settings
+from app.core.lifespan import drain, warm_up
+from app.core.logs import RequestContextMiddleware
+from app.core.metrics import PrometheusMiddleware, update_threadpool_metrics
+from app.core.openapi import install_openapi_route, load_openapi_document
+from app.core.queries import QueryStatsMiddleware
+from app.core.threadpool import configure_threadpools
+
+logger = logging.getLogger(__name__)
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -12,14 +25,45 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 
 
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
-    sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
+    # Imported here so that it's only loaded when Sentry is actually enabled
+    import sentry_sdk
+
+    from app.core.tracing import before_send_transaction, traces_sampler
+
+    sentry_sdk.init(
+        dsn=str(settings.SENTRY_DSN),
+        traces_sampler=traces_sampler,
+        before_send_transaction=before_send_transaction,  # type: ignore[arg-type]
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    app.state.ready = False
+    configure_threadpools()
+    update_threadpool_metrics()
+    await to_thread.run_sync(warm_up)
+    app.state.ready = True
+    logger.info("Worker ready")
+    yield
+    # uvicorn has stopped accepting connections and waited for the requests
+    # in progress
+    app.state.ready = False
+    await to_thread.run_sync(drain)
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
+# Added first to be the innermost, so the rejected requests are still
+# logged, counted and given CORS headers
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
 # Set all CORS enabled origins
 if settings.all_cors_origins:
     app.add_middleware(
@@ -30,4 +74,14 @@ if settings.all_cors_origins:
         allow_headers=["*"],
     )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(PrometheusMiddleware)
+
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+# Generate the schema once at startup instead of on the first request
+openapi_document = load_openapi_document(app, settings.OPENAPI_SCHEMA_FILE)
+install_openapi_route(app, openapi_document)
@@ -1,8 +1,27 @@
 import uuid
+from datetime import datetime, timezone
+from typing import Any, ClassVar, Literal
 
 from pydantic import EmailStr
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Computed,
+    DateTime,
+    Index,
+    func,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Mapped, deferred
 from sqlmodel import Field, Relationship, SQLModel
 
+from app.core.ids import uuid7
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
 
 # Shared properties
 class UserBase(SQLModel):
@@ -41,7 +60,13 @@ class UpdatePassword(SQLModel):
 
 # Database model, database table inferred from class name
 class User(UserBase, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    __table_args__ = (
+        # Case insensitive prefix search, in any database collation
+        Index("ix_user_email_prefix", text("lower(email) text_pattern_ops")),
+        Index("ix_user_full_name_prefix", text("lower(full_name) text_pattern_ops")),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid7, primary_key=True)
     hashed_password: str
     items: list["Item"] = Relationship(back_populates="owner", cascade_delete=True)
 
@@ -56,6 +81,31 @@ class UsersPublic(SQLModel):
     count: int
 
 
+# Small projection of the users found by the search, for type-ahead
+class UserSearchPublic(SQLModel):
+    id: uuid.UUID
+    email: str
+    full_name: str | None
+
+
+class UsersSearchPublic(SQLModel):
+    data: list[UserSearchPublic]
+
+
+# Users created in bulk by a superuser
+class UsersImport(SQLModel):
+    # Their passwords are hashed in the request, larger imports go through
+    # app/import_users.py
+    users: list[UserCreate] = Field(min_length=1, max_length=100)
+    send_emails: bool = True
+
+
+class UsersImportPublic(SQLModel):
+    created: list[UserPublic]
+    # Emails already registered or repeated in the import
+    skipped: list[str]
+
+
 # Shared properties
 class ItemBase(SQLModel):
     title: str = Field(min_length=1, max_length=255)
@@ -74,18 +124,74 @@ class ItemUpdate(ItemBase):
 
 # Database model, database table inferred from class name
 class Item(ItemBase, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    __table_args__ = (
+        # For the filters and sorts of read_items, with and without the owner
+        Index("ix_item_owner_id_created_at", "owner_id", "created_at", "id"),
+        Index("ix_item_owner_id_title", "owner_id", "title", "id"),
+        Index("ix_item_created_at", "created_at", "id"),
+        Index("ix_item_title", "title", "id"),
+        # For the title prefix filters, in any database collation
+        Index(
+            "ix_item_owner_id_title_prefix",
+            "owner_id",
+            "title",
+            postgresql_ops={"title": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_item_title_prefix",
+            "title",
+            postgresql_ops={"title": "text_pattern_ops"},
+        ),
+        Index("ix_item_search_vector", "search_vector", postgresql_using="gin"),
+        # The fuzzy matching of the titles has a trigram index too, only
+        # created by the migrations where pg_trgm is available
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid7, primary_key=True)
     title: str = Field(max_length=255)
     owner_id: uuid.UUID = Field(
         foreign_key="user.id", nullable=False, ondelete="CASCADE"
     )
     owner: User | None = Relationship(back_populates="items")
+    created_at: datetime = Field(
+        default_factory=utc_now,
+        sa_type=DateTime(timezone=True),  # type: ignore
+        # Also set for the rows copied in bulk
+        sa_column_kwargs={"server_default": func.now()},
+    )
+    # Words of the title and description for the full-text search, computed
+    # by the database, the ones of the title rank higher. Only used in the
+    # queries, it isn't a field and isn't loaded with the items
+    search_vector: ClassVar[Mapped[Any]] = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                "setweight(to_tsvector('english', title), 'A') || "
+                "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+            ),
+        )
+    )
 
 
 # Properties to return via API, id is always required
 class ItemPublic(ItemBase):
     id: uuid.UUID
     owner_id: uuid.UUID
+    created_at: datetime
+
+
+# Query parameters of the item listings
+class ItemsFilter(SQLModel):
+    # Prefix of the title, case sensitive
+    title: str | None = Field(default=None, min_length=1, max_length=255)
+    # Not indexed, checked on the items read in the order of the sort
+    has_description: bool | None = None
+    # Only for superusers, the other users only get their own items
+    owner_id: uuid.UUID | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    # Descending with a "-"
+    sort: Literal["created_at", "-created_at", "title", "-title"] = "-created_at"
 
 
 class ItemsPublic(SQLModel):
@@ -93,11 +199,147 @@ class ItemsPublic(SQLModel):
     count: int
 
 
+class ItemsSearchPublic(SQLModel):
+    data: list[ItemPublic]
+    # Pass it as `cursor` to get the next page, None on the last one
+    next_cursor: str | None
+
+
+# Emails waiting to be sent by the background worker in app/email_worker.py
+class EmailOutbox(SQLModel, table=True):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_pending_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    email_to: str = Field(max_length=255)
+    subject: str = Field(max_length=1024)
+    html_content: str
+    # One of "pending", "sent" or "failed"
+    status: str = Field(default="pending", max_length=20)
+    attempts: int = 0
+    last_error: str | None = Field(default=None, max_length=1024)
+    created_at: datetime = Field(
+        default_factory=utc_now,
+        sa_type=DateTime(timezone=True),  # type: ignore
+    )
+    next_attempt_at: datetime = Field(
+        default_factory=utc_now,
+        sa_type=DateTime(timezone=True),  # type: ignore
+    )
+    sent_at: datetime | None = Field(
+        default=None,
+        sa_type=DateTime(timezone=True),  # type: ignore
+    )
+
+
+# Shared properties
+class EmailBroadcastBase(SQLModel):
+    subject: str = Field(min_length=1, max_length=255)
+    # HTML inserted in the broadcast email template
+    content: str = Field(min_length=1)
+
+
+# Properties to receive on broadcast creation
+class EmailBroadcastCreate(EmailBroadcastBase):
+    pass
+
+
+# Email sent to all the active users, by the background worker
+class EmailBroadcast(EmailBroadcastBase, table=True):
+    __tablename__ = "email_broadcast"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    # One of "pending", "running" or "completed"
+    status: str = Field(default="pending", max_length=20)
+    total_recipients: int | None = None
+    sent_count: int = 0
+    failed_count: int = 0
+    # Recipients are sent in email order, the last one sent is the checkpoint
+    # from where a broadcast interrupted by a crash is resumed
+    last_email: str | None = Field(default=None, max_length=255)
+    # Lease of the worker sending it, another one can take over after it
+    locked_until: datetime | None = Field(
+        default=None,
+        sa_type=DateTime(timezone=True),  # type: ignore
+    )
+    # Token of the worker holding the lease, only that one extends it and
+    # saves the progress
+    lease_owner: uuid.UUID | None = None
+    created_at: datetime = Field(
+        default_factory=utc_now,
+        sa_type=DateTime(timezone=True),  # type: ignore
+    )
+    finished_at: datetime | None = Field(
+        default=None,
+        sa_type=DateTime(timezone=True),  # type: ignore
+    )
+
+
+# Properties to return via API, id is always required
+class EmailBroadcastPublic(EmailBroadcastBase):
+    id: uuid.UUID
+    status: str
+    total_recipients: int | None
+    sent_count: int
+    failed_count: int
+    created_at: datetime
+    finished_at: datetime | None
+
+
+# Import of items from a file by app/import_items.py, with the checkpoint
+# from where it's resumed if interrupted
+class ItemImport(SQLModel, table=True):
+    __tablename__ = "item_import"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    source: str = Field(max_length=1024)
+    # One of "running" or "completed"
+    status: str = Field(default="running", max_length=20)
+    # Bytes of the file read and staged so far
+    offset: int = Field(default=0, sa_type=BigInteger)
+    rows_staged: int = 0
+    rows_rejected: int = 0
+    rows_imported: int | None = None
+    created_at: datetime = Field(
+        default_factory=utc_now,
+        sa_type=DateTime(timezone=True),  # type: ignore
+    )
+    finished_at: datetime | None = Field(
+        default=None,
+        sa_type=DateTime(timezone=True),  # type: ignore
+    )
+
+
+# Validated rows of an import, waiting to be merged into the item table
+class ItemImportRow(SQLModel, table=True):
+    __tablename__ = "item_import_row"
+
+    id: uuid.UUID = Field(primary_key=True)
+    import_id: uuid.UUID = Field(
+        foreign_key="item_import.id", index=True, ondelete="CASCADE"
+    )
+    title: str = Field(max_length=255)
+    description: str | None = Field(default=None, max_length=255)
+    owner_id: uuid.UUID
+
+
 # Generic message
 class Message(SQLModel):
     message: str
 
 
+# State of the worker and its dependencies, for the probes of the orchestrator
+class HealthCheck(SQLModel):
+    status: Literal["ok", "degraded", "unavailable"]
+    checks: dict[str, str] = {}
+
+
 # JSON payload containing access token
 class Token(SQLModel):
     access_token: str
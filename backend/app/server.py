@@ -0,0 +1,274 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import tempfile
+import time
+from pathlib import Path
+from types import FrameType
+
+import uvicorn
+from fastapi import FastAPI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the workers' state and memory
+supervise_interval = 1.0
+
+
+def available_cpus() -> int:
+    # Respect a cgroup v2 CPU quota (e.g. docker --cpus) when there is one
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as cpu_max:
+            quota, period = cpu_max.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def available_memory_mb() -> int | None:
+    try:
+        with open("/sys/fs/cgroup/memory.max") as memory_max:
+            limit = memory_max.read().strip()
+        if limit != "max":
+            return int(limit) // (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def default_worker_count(max_rss_mb: int | None) -> int:
+    """
+    One worker per available core, but no more workers than fit in the
+    available memory if each one grows up to `max_rss_mb`.
+    """
+    workers = available_cpus()
+    memory_mb = available_memory_mb()
+    if memory_mb and max_rss_mb:
+        workers = min(workers, memory_mb // max_rss_mb)
+    return max(1, workers)
+
+
+def read_rss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def mark_process_dead(pid: int) -> None:
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(pid)  # type: ignore[no-untyped-call]
+
+
+class PreforkServer:
+    """
+    Load the app once in this (master) process and fork the workers from it,
+    so that they share the memory pages of the already imported code.
+    """
+
+    def __init__(
+        self,
+        app: FastAPI,
+        *,
+        host: str,
+        port: int,
+        workers: int,
+        max_rss_mb: int | None,
+        graceful_timeout: int,
+    ) -> None:
+        self.config = uvicorn.Config(
+            app,
+            host=host,
+            port=port,
+            proxy_headers=True,
+            # Log through the app's handlers, requests are logged by the app
+            log_config=None,
+            access_log=False,
+        )
+        self.workers = workers
+        self.max_rss_mb = max_rss_mb
+        self.graceful_timeout = graceful_timeout
+        self.children: set[int] = set()
+        # Workers asked to stop, with the time at which they will be killed
+        self.retiring: dict[int, float] = {}
+        self.should_exit = False
+
+    def run(self) -> None:
+        sock = self.config.bind_socket()
+        # Move everything allocated so far to the permanent generation, so the
+        # garbage collector of the workers doesn't touch (and copy) those pages
+        gc.freeze()
+        for _ in range(self.workers):
+            self.spawn_worker(sock)
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        signal.signal(signal.SIGINT, self.handle_exit)
+        logger.info(f"Started {self.workers} workers on pid {os.getpid()}")
+        while not self.should_exit:
+            time.sleep(supervise_interval)
+            self.reap_workers(sock)
+            self.recycle_workers(sock)
+            self.kill_overdue_workers()
+        self.shutdown()
+        sock.close()
+
+    def spawn_worker(self, sock: socket.socket) -> None:
+        # Hold signals until the worker has restored the default handlers,
+        # otherwise a SIGTERM right after the fork would reach the handler
+        # copied from the master and be ignored
+        exit_signals = {signal.SIGTERM, signal.SIGINT}
+        signal.pthread_sigmask(signal.SIG_BLOCK, exit_signals)
+        pid = os.fork()
+        if pid:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, exit_signals)
+            self.children.add(pid)
+            return
+        # In the worker
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, exit_signals)
+        gc.enable()
+        from app.core.db import engine
+        from app.core.logs import stop_logging
+
+        # Don't share the connections of the master's pool with the workers
+        engine.dispose(close=False)
+        uvicorn.Server(self.config).run(sockets=[sock])
+        # os._exit() skips the atexit handlers
+        stop_logging()
+        os._exit(0)
+
+    def handle_exit(self, _signum: int, _frame: FrameType | None) -> None:
+        self.should_exit = True
+
+    def reap_workers(self, sock: socket.socket) -> None:
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                return
+            self.children.discard(pid)
+            mark_process_dead(pid)
+            if self.retiring.pop(pid, None) is not None or self.should_exit:
+                continue
+            logger.warning(
+                f"Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}, "
+                "starting a new one"
+            )
+            self.spawn_worker(sock)
+
+    def recycle_workers(self, sock: socket.socket) -> None:
+        if not self.max_rss_mb:
+            return
+        for pid in list(self.children - self.retiring.keys()):
+            rss_mb = read_rss_mb(pid)
+            if rss_mb is None or rss_mb <= self.max_rss_mb:
+                continue
+            logger.info(
+                f"Worker {pid} uses {rss_mb:.0f} MB, over the limit of "
+                f"{self.max_rss_mb} MB, recycling it"
+            )
+            # Start the replacement first, so capacity doesn't drop while the
+            # old worker finishes its in-flight requests
+            self.spawn_worker(sock)
+            self.retire_worker(pid)
+
+    def retire_worker(self, pid: int) -> None:
+        self.retiring[pid] = time.monotonic() + self.graceful_timeout
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def kill_overdue_workers(self) -> None:
+        now = time.monotonic()
+        for pid, deadline in self.retiring.items():
+            if now > deadline:
+                logger.warning(f"Worker {pid} didn't stop in time, killing it")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def shutdown(self) -> None:
+        logger.info("Shutting down workers")
+        for pid in self.children - self.retiring.keys():
+            self.retire_worker(pid)
+        while self.children:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self.children.discard(pid)
+                self.retiring.pop(pid, None)
+                mark_process_dead(pid)
+            else:
+                time.sleep(0.1)
+                self.kill_overdue_workers()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the app with forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    args = parser.parse_args()
+
+    # The workers write their metrics to files in this directory, so that
+    # the metrics server of this process can report all of them. It must be
+    # set before the app (and prometheus_client) is imported
+    metrics_dir = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="prometheus-")
+    )
+    for path in Path(metrics_dir).glob("*.db"):
+        path.unlink()
+    # Not done by the app when imported, the workers inherit it
+    from app.core.logs import setup_logging
+
+    setup_logging()
+
+    max_rss_mb = settings.SERVER_WORKER_MAX_RSS_MB
+    workers = args.workers or default_worker_count(max_rss_mb)
+    # Don't collect while importing: the collections would only create holes
+    # in the pages that are about to be shared with the workers
+    gc.disable()
+    from app.core.metrics import start_metrics_server
+    from app.main import app
+    from app.utils import precompile_email_templates
+
+    # Compile the templates once here instead of on the first email of each
+    # worker
+    precompile_email_templates()
+
+    if settings.METRICS_ENABLED:
+        start_metrics_server(args.host, settings.METRICS_PORT)
+
+    PreforkServer(
+        app,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        max_rss_mb=max_rss_mb,
+        graceful_timeout=settings.SERVER_GRACEFUL_TIMEOUT,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 import uuid
 
+import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session
 
+from app import crud
 from app.core.config import settings
+from app.core.db import engine
+from app.models import ItemCreate
 from app.tests.utils.item import create_random_item
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
 
 
 def test_create_item(
@@ -79,6 +85,73 @@ def test_read_items(
     assert len(content["data"]) >= 2
 
 
+def test_read_items_filtered_and_sorted(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    owner = create_random_user(db)
+    prefix = random_lower_string()
+    with_description = crud.create_item(
+        session=db,
+        item_in=ItemCreate(title=f"{prefix} b", description="Description"),
+        owner_id=owner.id,
+    )
+    without_description = crud.create_item(
+        session=db, item_in=ItemCreate(title=f"{prefix} a"), owner_id=owner.id
+    )
+    crud.create_item(session=db, item_in=ItemCreate(title="Other"), owner_id=owner.id)
+
+    def read_titles(**params: str | bool) -> list[str]:
+        response = client.get(
+            f"{settings.API_V1_STR}/items/",
+            headers=superuser_token_headers,
+            params={"owner_id": str(owner.id), **params},
+        )
+        assert response.status_code == 200
+        content = response.json()
+        assert content["count"] == len(content["data"])
+        return [item["title"] for item in content["data"]]
+
+    assert read_titles(title=prefix, sort="title") == [
+        without_description.title,
+        with_description.title,
+    ]
+    assert read_titles(title=prefix, sort="-title") == [
+        with_description.title,
+        without_description.title,
+    ]
+    assert read_titles(title=prefix, has_description=True) == [with_description.title]
+    assert read_titles(
+        created_after=with_description.created_at.isoformat(),
+        created_before=without_description.created_at.isoformat(),
+    ) == [with_description.title]
+    # Newest first by default
+    assert read_titles()[0] == "Other"
+
+
+def test_read_items_invalid_sort(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"sort": "owner_id"},
+    )
+    assert response.status_code == 422
+
+
+def test_read_items_of_another_owner(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"owner_id": str(item.owner_id)},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Not enough permissions"
+
+
 def test_update_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -162,3 +235,87 @@ def test_delete_item_not_enough_permissions(
     assert response.status_code == 400
     content = response.json()
     assert content["detail"] == "Not enough permissions"
+
+
+def test_search_items(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+    assert user
+    word = random_lower_string()
+    in_description = crud.create_item(
+        session=db,
+        item_in=ItemCreate(title="Other", description=f"About {word}"),
+        owner_id=user.id,
+    )
+    in_title = crud.create_item(
+        session=db, item_in=ItemCreate(title=f"{word} notes"), owner_id=user.id
+    )
+    # Not returned, owned by another user
+    crud.create_item(
+        session=db,
+        item_in=ItemCreate(title=word),
+        owner_id=create_random_user(db).id,
+    )
+
+    ids = []
+    params: dict[str, str | int] = {"q": word, "limit": 1}
+    while True:
+        response = client.get(
+            f"{settings.API_V1_STR}/items/search",
+            headers=normal_user_token_headers,
+            params=params,
+        )
+        assert response.status_code == 200
+        content = response.json()
+        ids += [item["id"] for item in content["data"]]
+        if not content["next_cursor"]:
+            break
+        params["cursor"] = content["next_cursor"]
+    # The matches in the title rank first
+    assert ids == [str(in_title.id), str(in_description.id)]
+
+
+def test_search_items_invalid_cursor(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/items/search",
+        headers=normal_user_token_headers,
+        params={"q": "notes", "cursor": "invalid"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize(
+    "params", [{"q": "notes", "limit": 1000}, {"q": ""}, {"q": "a" * 256}]
+)
+def test_search_items_invalid_params(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    params: dict[str, str | int],
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/items/search",
+        headers=normal_user_token_headers,
+        params=params,
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.skipif(
+    not crud.has_extension(engine, "pg_trgm"), reason="pg_trgm is not installed"
+)
+def test_search_items_fuzzy(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/items/search",
+        headers=superuser_token_headers,
+        # A typo in the title
+        params={"q": f"{item.title[:-1]}x"},
+    )
+    assert response.status_code == 200
+    assert str(item.id) in [item["id"] for item in response.json()["data"]]
@@ -5,7 +5,7 @@ from sqlmodel import Session, select
 
 from app.core.config import settings
 from app.core.security import verify_password
-from app.models import User
+from app.models import EmailOutbox, User
 from app.utils import generate_password_reset_token
 
 
@@ -43,7 +43,7 @@ def test_use_access_token(
 
 
 def test_recovery_password(
-    client: TestClient, normal_user_token_headers: dict[str, str]
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
 ) -> None:
     with (
         patch("app.core.config.settings.SMTP_HOST", "smtp.example.com"),
@@ -56,19 +56,36 @@ def test_recovery_password(
         )
         assert r.status_code == 200
         assert r.json() == {"message": "Password recovery email sent"}
+        queued_emails = db.exec(
+            select(EmailOutbox).where(EmailOutbox.email_to == email)
+        ).all()
+        assert any("Password recovery" in e.subject for e in queued_emails)
 
 
 def test_recovery_password_user_not_exits(
     client: TestClient, normal_user_token_headers: dict[str, str]
 ) -> None:
     email = "jVgQr@example.com"
-    r = client.post(
-        f"{settings.API_V1_STR}/password-recovery/{email}",
-        headers=normal_user_token_headers,
-    )
+    with patch("app.core.config.settings.SMTP_HOST", "smtp.example.com"):
+        r = client.post(
+            f"{settings.API_V1_STR}/password-recovery/{email}",
+            headers=normal_user_token_headers,
+        )
     assert r.status_code == 404
 
 
+def test_recovery_password_emails_disabled(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    with patch("app.core.config.settings.SMTP_HOST", None):
+        r = client.post(
+            f"{settings.API_V1_STR}/password-recovery/{settings.EMAIL_TEST_USER}",
+            headers=normal_user_token_headers,
+        )
+    assert r.status_code == 503
+    assert r.json()["detail"] == "Emails are not enabled"
+
+
 def test_reset_password(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -2,12 +2,19 @@ import uuid
 from unittest.mock import patch
 
 from fastapi.testclient import TestClient
-from sqlmodel import Session, select
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session, col, select
 
 from app import crud
 from app.core.config import settings
-from app.core.security import verify_password
-from app.models import User, UserCreate
+from app.core.db import engine
+from app.core.security import (
+    get_password_hash,
+    get_password_hashes,
+    verify_password,
+)
+from app.core.threadpool import get_blocking_limiter
+from app.models import EmailOutbox, User, UserCreate
 from app.tests.utils.utils import random_email, random_lower_string
 
 
@@ -37,7 +44,6 @@ def test_create_user_new_email(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
     with (
-        patch("app.utils.send_email", return_value=None),
         patch("app.core.config.settings.SMTP_HOST", "smtp.example.com"),
         patch("app.core.config.settings.SMTP_USER", "admin@example.com"),
     ):
@@ -54,6 +60,11 @@ def test_create_user_new_email(
         user = crud.get_user_by_email(session=db, email=username)
         assert user
         assert user.email == created_user["email"]
+        queued_email = db.exec(
+            select(EmailOutbox).where(EmailOutbox.email_to == username)
+        ).one()
+        assert queued_email.status == "pending"
+        assert username in queued_email.subject
 
 
 def test_get_existing_user(
@@ -484,3 +495,180 @@ def test_delete_user_without_privileges(
     )
     assert r.status_code == 403
     assert r.json()["detail"] == "The user doesn't have enough privileges"
+
+
+def test_import_users(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    existing_email = random_email()
+    crud.create_user(
+        session=db,
+        user_create=UserCreate(email=existing_email, password=random_lower_string()),
+    )
+    new_email = random_email()
+    data = {
+        "users": [
+            {"email": new_email, "password": random_lower_string()},
+            {"email": existing_email, "password": random_lower_string()},
+        ]
+    }
+    with (
+        patch("app.core.config.settings.SMTP_HOST", "smtp.example.com"),
+        patch("app.core.config.settings.SMTP_USER", "admin@example.com"),
+        patch("app.core.config.settings.PASSWORD_HASH_WORKERS", 2),
+        patch("app.core.security.get_password_hash_executor") as executor,
+    ):
+        r = client.post(
+            f"{settings.API_V1_STR}/users/import",
+            headers=superuser_token_headers,
+            json=data,
+        )
+    assert r.status_code == 200
+    # Hashed in the request, the worker doesn't start a pool of processes
+    executor.assert_not_called()
+    result = r.json()
+    assert [user["email"] for user in result["created"]] == [new_email]
+    assert result["skipped"] == [existing_email]
+    queued = db.exec(
+        select(EmailOutbox.email_to).where(
+            col(EmailOutbox.email_to).in_([new_email, existing_email])
+        )
+    ).all()
+    assert queued == [new_email]
+
+
+def test_import_users_hashes_without_connection(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    pool = engine.pool
+    assert isinstance(pool, QueuePool)
+    checked_out: list[int] = []
+
+    def hash_passwords(passwords: list[str]) -> list[str]:
+        checked_out.append(pool.checkedout())
+        return get_password_hashes(passwords)
+
+    before = pool.checkedout()
+    with patch("app.api.routes.users.get_password_hashes", hash_passwords):
+        r = client.post(
+            f"{settings.API_V1_STR}/users/import",
+            headers=superuser_token_headers,
+            json={"users": [{"email": random_email(), "password": "password"}]},
+        )
+    assert r.status_code == 200
+    # The connection of the authentication was returned before hashing
+    assert checked_out == [before]
+
+
+def test_password_hashed_in_blocking_threads(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    # Tokens of the threads for blocking work in use while hashing
+    borrowed: list[float] = []
+
+    def hash_password(password: str) -> str:
+        borrowed.append(get_blocking_limiter().borrowed_tokens)
+        return get_password_hash(password)
+
+    def check_password(password: str, hashed_password: str) -> bool:
+        borrowed.append(get_blocking_limiter().borrowed_tokens)
+        return verify_password(password, hashed_password)
+
+    with (
+        patch("app.api.routes.users.get_password_hash", hash_password),
+        patch("app.api.routes.users.verify_password", check_password),
+    ):
+        r = client.post(
+            f"{settings.API_V1_STR}/users/signup",
+            json={"email": random_email(), "password": random_lower_string()},
+        )
+        assert r.status_code == 200
+        r = client.patch(
+            f"{settings.API_V1_STR}/users/me/password",
+            headers=normal_user_token_headers,
+            json={"current_password": "wrong password", "new_password": "whatever"},
+        )
+        assert r.status_code == 400
+    assert borrowed == [1, 1]
+
+
+def test_import_users_too_many(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    data = {
+        "users": [
+            {"email": random_email(), "password": random_lower_string()}
+            for _ in range(101)
+        ]
+    }
+    r = client.post(
+        f"{settings.API_V1_STR}/users/import",
+        headers=superuser_token_headers,
+        json=data,
+    )
+    assert r.status_code == 422
+
+
+def test_import_users_without_privileges(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    data = {"users": [{"email": random_email(), "password": random_lower_string()}]}
+    r = client.post(
+        f"{settings.API_V1_STR}/users/import",
+        headers=normal_user_token_headers,
+        json=data,
+    )
+    assert r.status_code == 403
+
+
+def test_search_users(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    prefix = random_lower_string()
+    by_email = crud.create_user(
+        session=db,
+        user_create=UserCreate(
+            email=f"{prefix}@example.com", password=random_lower_string()
+        ),
+    )
+    by_name = crud.create_user(
+        session=db,
+        user_create=UserCreate(
+            email=random_email(),
+            password=random_lower_string(),
+            full_name=f"{prefix.upper()} Lovelace",
+        ),
+    )
+    r = client.get(
+        f"{settings.API_V1_STR}/users/search",
+        headers=superuser_token_headers,
+        params={"q": prefix[:10].upper()},
+    )
+    assert r.status_code == 200
+    found = r.json()["data"]
+    assert sorted(user["id"] for user in found) == sorted(
+        [str(by_email.id), str(by_name.id)]
+    )
+    assert set(found[0]) == {"id", "email", "full_name"}
+
+
+def test_search_users_limit(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/users/search",
+        headers=superuser_token_headers,
+        params={"q": "a", "limit": 1000},
+    )
+    assert r.status_code == 422
+
+
+def test_search_users_without_privileges(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/users/search",
+        headers=normal_user_token_headers,
+        params={"q": "a"},
+    )
+    assert r.status_code == 403
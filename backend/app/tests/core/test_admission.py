@@ -0,0 +1,106 @@
+from unittest.mock import patch
+
+import anyio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.admission import (
+    AdmissionControlMiddleware,
+    ConcurrencyLimiter,
+    get_limiters,
+    get_route_group,
+)
+from app.core.config import settings
+
+
+def test_limiter_queue() -> None:
+    async def run() -> None:
+        limiter = ConcurrencyLimiter(limit=1, queue_size=1, timeout=5)
+        admitted: list[bool] = []
+
+        async def wait_turn() -> None:
+            admitted.append(await limiter.acquire())
+
+        assert await limiter.acquire()
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(wait_turn)
+            await anyio.wait_all_tasks_blocked()
+            # The queue is full
+            assert not await limiter.acquire()
+            limiter.release()
+        assert admitted == [True]
+        assert limiter.active == 1
+        limiter.release()
+        assert limiter.active == 0
+
+    anyio.run(run)
+
+
+def test_limiter_timeout() -> None:
+    async def run() -> None:
+        limiter = ConcurrencyLimiter(limit=1, queue_size=10, timeout=0.05)
+        assert await limiter.acquire()
+        assert not await limiter.acquire()
+        assert not limiter.waiters
+
+    anyio.run(run)
+
+
+def test_route_groups() -> None:
+    def group(method: str, path: str) -> str | None:
+        return get_route_group({"type": "http", "method": method, "path": path})
+
+    api = settings.API_V1_STR
+    assert group("POST", f"{api}/login/access-token") == "auth"
+    assert group("POST", f"{api}/users/signup") == "auth"
+    assert group("GET", f"{api}/items/") == "reads"
+    assert group("POST", f"{api}/items/") == "writes"
+    assert group("GET", f"{api}/utils/health-check/") is None
+    assert group("GET", f"{api}/utils/health/ready/") is None
+    assert group("GET", "/docs") is None
+
+
+@pytest.mark.parametrize(("pool_size", "max_overflow"), [(5, 10), (5, 0), (20, 0)])
+def test_limits_from_pool_size(pool_size: int, max_overflow: int) -> None:
+    with (
+        patch("app.core.config.settings.POSTGRES_POOL_SIZE", pool_size),
+        patch("app.core.config.settings.POSTGRES_MAX_OVERFLOW", max_overflow),
+    ):
+        limiters = get_limiters()
+    limits = {group: limiter.limit for group, limiter in limiters.items()}
+    # No more requests admitted than the pool has connections
+    assert sum(limits.values()) <= pool_size + max_overflow
+    assert 0 < limits["auth"] <= limits["writes"] < limits["reads"]
+
+
+def test_saturated_group_shed() -> None:
+    app = FastAPI()
+
+    @app.post(f"{settings.API_V1_STR}/login/access-token")
+    def login() -> str:
+        return "token"
+
+    @app.get(f"{settings.API_V1_STR}/items/")
+    def read_items() -> list[str]:
+        return []
+
+    limiters = get_limiters()
+    # All the logins in progress
+    limiters["auth"] = ConcurrencyLimiter(limit=0, queue_size=0, timeout=1)
+    app.add_middleware(AdmissionControlMiddleware, limiters=limiters)
+    before = REGISTRY.get_sample_value("http_requests_shed_total", {"group": "auth"})
+
+    with TestClient(app) as client:
+        r = client.post(f"{settings.API_V1_STR}/login/access-token")
+        assert r.status_code == 503
+        assert r.headers["Retry-After"] == "1"
+        assert r.json() == {"detail": "The server is busy, try again"}
+        # The reads aren't affected
+        r = client.get(f"{settings.API_V1_STR}/items/")
+        assert r.status_code == 200
+
+    after = REGISTRY.get_sample_value("http_requests_shed_total", {"group": "auth"})
+    assert after == (before or 0) + 1
+    assert limiters["reads"].active == 0
@@ -0,0 +1,90 @@
+from typing import Any
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.tests.utils.item import create_random_item
+
+
+def show_statement_timeout(session: Session, **_kwargs: Any) -> tuple[list[Any], int]:
+    timeout = session.execute(text("SHOW statement_timeout")).scalar_one()
+    return [], int(timeout.removesuffix("ms"))
+
+
+def read_items_timeout(client: TestClient, headers: dict[str, str]) -> int:
+    with patch("app.crud.get_items", side_effect=show_statement_timeout):
+        response = client.get(f"{settings.API_V1_STR}/items/", headers=headers)
+    assert response.status_code == 200
+    return int(response.json()["count"])
+
+
+def test_route_budget(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    # The budget of read_items, minus the time spent before the query
+    assert 2_000 < read_items_timeout(client, normal_user_token_headers) < 3_000
+
+
+def test_client_deadline(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    headers = {**normal_user_token_headers, "X-Request-Timeout": "500"}
+    assert 0 < read_items_timeout(client, headers) <= 500
+
+    # A client can't raise the budget
+    headers["X-Request-Timeout"] = "60000"
+    assert read_items_timeout(client, headers) < 3_000
+
+
+def test_invalid_client_deadline(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    for value in ["soon", "0", "-1"]:
+        response = client.get(
+            f"{settings.API_V1_STR}/items/",
+            headers={**normal_user_token_headers, "X-Request-Timeout": value},
+        )
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid X-Request-Timeout header"}
+
+
+def test_statement_timeout(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    def slow_query(session: Session, **_kwargs: Any) -> None:
+        session.execute(text("SELECT pg_sleep(2)"))
+
+    with patch("app.crud.get_items", side_effect=slow_query):
+        response = client.get(
+            f"{settings.API_V1_STR}/items/",
+            headers={**normal_user_token_headers, "X-Request-Timeout": "200"},
+        )
+    assert response.status_code == 504
+    assert response.json() == {"detail": "The request took too long"}
+
+
+def test_lock_timeout(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    with (
+        engine.connect() as connection,
+        patch("app.core.config.settings.POSTGRES_LOCK_TIMEOUT_MS", 100),
+    ):
+        connection.execute(
+            text("SELECT 1 FROM item WHERE id = :id FOR UPDATE"), {"id": item.id}
+        )
+        response = client.put(
+            f"{settings.API_V1_STR}/items/{item.id}",
+            headers=superuser_token_headers,
+            json={"title": "Locked"},
+        )
+        connection.rollback()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    db.refresh(item)
+    assert item.title != "Locked"
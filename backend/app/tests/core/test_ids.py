@@ -0,0 +1,23 @@
+import time
+from unittest.mock import patch
+
+from app.core import ids
+from app.core.ids import uuid7
+
+
+def test_uuid7() -> None:
+    before_ms = time.time_ns() // 1_000_000
+    values = [uuid7() for _ in range(10_000)]
+    assert all(value.version == 7 for value in values)
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+    assert values[0].int >> 80 >= before_ms
+
+
+def test_uuid7_counter_overflow() -> None:
+    # All generated in the same millisecond
+    with patch("app.core.ids.time.time_ns", return_value=time.time_ns() + 10**9):
+        values = [uuid7() for _ in range(ids.COUNTER_MAX + 2)]
+    assert values == sorted(values)
+    # The time moves ahead when the counter is exhausted
+    assert values[-1].int >> 80 == (values[0].int >> 80) + 1
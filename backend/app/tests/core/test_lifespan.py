@@ -0,0 +1,66 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.lifespan import warm_up
+from app.core.replicas import ReplicaPool
+from app.core.security import (
+    get_password_hash_executor,
+    get_password_hashes,
+    shutdown_password_hash_executor,
+)
+from app.main import app
+
+
+def test_lifespan_warms_and_drains_pool() -> None:
+    pool = engine.pool
+    assert isinstance(pool, QueuePool)
+    with (
+        patch("app.core.config.settings.POSTGRES_POOL_WARMUP", 3),
+        TestClient(app),
+    ):
+        assert app.state.ready
+        assert pool.checkedin() >= 3
+    assert not app.state.ready
+    # Disposed, replaced by an empty pool
+    assert engine.pool is not pool
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.checkedin() == 0
+
+
+def test_lifespan_starts_and_stops_replica_checks() -> None:
+    replicas = ReplicaPool([engine])
+    with patch("app.core.lifespan.replicas", replicas), TestClient(app):
+        assert replicas.thread and replicas.thread.is_alive()
+    assert replicas.thread is None
+
+
+def test_warm_up_capped_by_pool_size() -> None:
+    with (
+        patch("app.core.config.settings.POSTGRES_POOL_WARMUP", 100),
+        patch("app.core.lifespan.warm_pool") as warm_pool,
+    ):
+        warm_up()
+    warm_pool.assert_called_once_with(engine, settings.POSTGRES_POOL_SIZE)
+
+
+def test_warm_up_without_database(caplog: pytest.LogCaptureFixture) -> None:
+    error = OperationalError("SELECT 1", {}, Exception("connection refused"))
+    with patch("app.core.lifespan.warm_pool", side_effect=error):
+        warm_up()
+    assert "Could not warm up the database pool" in caplog.text
+
+
+def test_shutdown_password_hash_executor() -> None:
+    with patch("app.core.config.settings.PASSWORD_HASH_WORKERS", 2):
+        assert len(get_password_hashes(["first", "second"], parallel=True)) == 2
+    assert get_password_hash_executor.cache_info().currsize == 1
+    shutdown_password_hash_executor()
+    assert get_password_hash_executor.cache_info().currsize == 0
+    # Nothing to do when it's not running
+    shutdown_password_hash_executor()
@@ -0,0 +1,122 @@
+import json
+import logging
+import sys
+from collections.abc import Generator
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.logs import (
+    JSONFormatter,
+    LogQueueHandler,
+    RequestContextFilter,
+    SamplingFilter,
+    get_queue_handler,
+)
+
+
+@pytest.fixture
+def records() -> Generator[list[logging.LogRecord], None, None]:
+    """
+    The records logged to a queue handler of the app, after its filters,
+    without the listener writing them.
+    """
+    root = logging.getLogger()
+    queue_handler = get_queue_handler()
+    records: list[logging.LogRecord] = []
+    level = root.level
+    root.setLevel(logging.INFO)
+    root.addHandler(queue_handler)
+    try:
+        with patch.object(queue_handler, "enqueue", records.append):
+            yield records
+    finally:
+        root.removeHandler(queue_handler)
+        root.setLevel(level)
+
+
+def test_request_logged_with_context(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    records: list[logging.LogRecord],
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers={**normal_user_token_headers, "X-Request-ID": "abc123"},
+    )
+    assert r.status_code == 200
+    assert r.headers["x-request-id"] == "abc123"
+    (record,) = (r for r in records if r.name == "app.access")
+    assert record.getMessage() == f"GET {settings.API_V1_STR}/items/ 200"
+    fields = vars(record)
+    assert fields["request_id"] == "abc123"
+    assert fields["route"] == "items-read_items"
+    assert fields["status"] == 200
+    assert fields["latency_ms"] > 0
+
+
+def test_request_id_generated(
+    client: TestClient, records: list[logging.LogRecord]
+) -> None:
+    r = client.get(f"{settings.API_V1_STR}/utils/health-check/")
+    request_id = r.headers["x-request-id"]
+    assert len(request_id) == 32
+    assert [vars(r)["request_id"] for r in records if r.name == "app.access"] == [
+        request_id
+    ]
+
+
+def test_no_request_context_outside_requests() -> None:
+    record = logging.makeLogRecord({"msg": "hello"})
+    assert RequestContextFilter().filter(record)
+    assert not hasattr(record, "request_id")
+
+
+def test_sampling_filter() -> None:
+    sampling = SamplingFilter({"sqlalchemy.engine": 0.1})
+
+    def kept(name: str, level: int) -> int:
+        record = logging.makeLogRecord({"name": name, "levelno": level})
+        return sum(sampling.filter(record) for _ in range(1000))
+
+    assert 50 < kept("sqlalchemy.engine.Engine", logging.DEBUG) < 150
+    assert 50 < kept("sqlalchemy.engine", logging.INFO) < 150
+    assert kept("sqlalchemy.engine", logging.WARNING) == 1000
+    assert kept("sqlalchemy.engines", logging.DEBUG) == 1000
+    assert kept("app", logging.DEBUG) == 1000
+
+
+def test_json_formatter() -> None:
+    logger = logging.getLogger("app.test")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logger.makeRecord(
+            "app.test",
+            logging.ERROR,
+            __file__,
+            1,
+            "Failed %s",
+            ("job",),
+            exc_info=sys.exc_info(),
+            extra={"request_id": "abc", "latency_ms": 1.5},
+        )
+    handler = LogQueueHandler(None)  # type: ignore[arg-type]
+    entry = json.loads(JSONFormatter().format(handler.prepare(record)))
+    assert entry["level"] == "ERROR"
+    assert entry["logger"] == "app.test"
+    assert entry["message"] == "Failed job"
+    assert entry["request_id"] == "abc"
+    assert entry["latency_ms"] == 1.5
+    assert "ValueError: boom" in entry["exception"]
+    assert "time" in entry
+
+
+def test_logging_not_set_up_by_app() -> None:
+    import app.main  # noqa: F401
+
+    # Only by the entry points, the tests keep the output of pytest
+    root = logging.getLogger()
+    assert not any(isinstance(h, LogQueueHandler) for h in root.handlers)
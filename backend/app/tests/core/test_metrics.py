@@ -0,0 +1,83 @@
+import threading
+from unittest.mock import patch
+
+import anyio
+import httpx
+from anyio import CapacityLimiter
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.config import settings
+from app.core.metrics import start_metrics_server
+from app.core.security import run_password_hashing
+
+
+def get_sample(name: str, labels: dict[str, str] | None = None) -> float:
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+def test_metrics_endpoint(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    labels = {"operation": "items-read_items", "method": "GET"}
+    before = get_sample("http_request_duration_seconds_count", labels)
+    r = client.get(f"{settings.API_V1_STR}/items/", headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert get_sample("http_request_duration_seconds_count", labels) == before + 1
+    assert get_sample("http_requests_total", {**labels, "status": "200"}) >= 1
+
+    # Not served by the app, only on the port of the metrics
+    assert client.get("/metrics").status_code == 404
+    server = start_metrics_server("127.0.0.1", 0)
+    try:
+        r = httpx.get(f"http://127.0.0.1:{server.server_port}/metrics")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    for name in (
+        "http_request_duration_seconds_bucket",
+        "http_requests_in_progress",
+        "db_pool_size",
+        "db_pool_checked_out",
+        "threadpool_tokens",
+        "threadpool_tokens_in_use",
+        "password_hash_queue_depth",
+    ):
+        assert name in r.text
+    assert 'operation="items-read_items"' in r.text
+
+
+def test_metrics_status_codes(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    labels = {"operation": "users-read_users", "method": "GET", "status": "403"}
+    before = get_sample("http_requests_total", labels)
+    r = client.get(f"{settings.API_V1_STR}/users/", headers=normal_user_token_headers)
+    assert r.status_code == 403
+    assert get_sample("http_requests_total", labels) == before + 1
+    assert get_sample("http_requests_in_progress") == 0
+
+
+def test_password_hash_queue_depth() -> None:
+    started, release = threading.Event(), threading.Event()
+    depths = []
+
+    def hash_password() -> None:
+        started.set()
+        release.wait(5)
+
+    async def run() -> None:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(run_password_hashing, hash_password)
+            tg.start_soon(run_password_hashing, hash_password)
+            await anyio.to_thread.run_sync(started.wait, 5)
+            # One hash running, the other one waiting for the thread
+            depths.append(get_sample("password_hash_queue_depth"))
+            release.set()
+        depths.append(get_sample("password_hash_queue_depth"))
+
+    with patch("app.core.threadpool._blocking_limiter", CapacityLimiter(1)):
+        anyio.run(run)
+    assert depths == [2, 0]
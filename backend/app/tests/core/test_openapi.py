@@ -0,0 +1,51 @@
+import gzip
+import json
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.openapi import load_openapi_document, serialize_openapi
+from app.main import app
+
+
+def test_openapi_served_precomputed(client: TestClient) -> None:
+    r = client.get(f"{settings.API_V1_STR}/openapi.json")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/json"
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["etag"]
+    assert r.json() == app.openapi()
+
+
+def test_openapi_uncompressed(client: TestClient) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/openapi.json",
+        headers={"Accept-Encoding": "identity"},
+    )
+    assert r.status_code == 200
+    assert "content-encoding" not in r.headers
+    assert r.content == serialize_openapi(app)
+
+
+def test_openapi_not_modified(client: TestClient) -> None:
+    url = f"{settings.API_V1_STR}/openapi.json"
+    etag = client.get(url).headers["etag"]
+    r = client.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag
+    assert not r.content
+    r = client.get(url, headers={"If-None-Match": '"stale"'})
+    assert r.status_code == 200
+
+
+def test_openapi_schema_file(tmp_path: Path) -> None:
+    schema_file = tmp_path / "openapi.json"
+    document = load_openapi_document(app, str(schema_file))
+    assert schema_file.read_bytes() == document.content
+    assert gzip.decompress(document.gzip_content) == document.content
+
+    schema_file.write_bytes(json.dumps({"openapi": "3.1.0"}).encode())
+    cached = load_openapi_document(app, str(schema_file))
+    assert json.loads(cached.content) == {"openapi": "3.1.0"}
+    assert cached.etag != document.etag
@@ -0,0 +1,114 @@
+import logging
+import re
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import ProgrammingError
+from sqlmodel import Session, text
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.queries import QueryStatsMiddleware, current_query_stats
+
+SERVER_TIMING = re.compile(r'^db;dur=\d+\.\d;desc="(\d+) queries"$')
+
+
+def test_server_timing_header(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.get(f"{settings.API_V1_STR}/items/", headers=normal_user_token_headers)
+    assert r.status_code == 200
+    match = SERVER_TIMING.match(r.headers["server-timing"])
+    assert match
+    # The timeouts, the current user, the count and the page of items
+    assert int(match.group(1)) == 4
+
+
+def test_server_timing_hidden_in_production(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    with patch("app.core.config.settings.ENVIRONMENT", "production"):
+        r = client.get(
+            f"{settings.API_V1_STR}/items/", headers=normal_user_token_headers
+        )
+    assert r.status_code == 200
+    assert "server-timing" not in r.headers
+
+
+def test_queries_outside_requests_not_counted(db: Session) -> None:
+    db.exec(text("SELECT 1"))  # type: ignore[call-overload]
+    assert current_query_stats.get() is None
+
+
+def test_failed_queries_recorded() -> None:
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/failed")
+    def failed() -> int:
+        with engine.connect() as connection:
+            with pytest.raises(ProgrammingError):
+                connection.execute(text("SELECT * FROM missing_table"))
+            return len(connection.info.get("query_start_time", []))
+
+    r = TestClient(app).get("/failed")
+    # No start time left behind in the connection by the failed statement
+    assert r.json() == 0
+    # And the failed statement is counted
+    assert r.headers["server-timing"].endswith('desc="1 queries"')
+
+
+@pytest.fixture
+def repeated_query_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/repeated")
+    def repeated() -> None:
+        with Session(engine) as session:
+            for i in range(3):
+                session.exec(text("SELECT :i").bindparams(i=i))  # type: ignore[call-overload]
+
+    return TestClient(app)
+
+
+def test_repeated_statements_logged(
+    repeated_query_client: TestClient, caplog: pytest.LogCaptureFixture
+) -> None:
+    with (
+        patch("app.core.config.settings.N_PLUS_ONE_THRESHOLD", 3),
+        caplog.at_level(logging.WARNING, logger="app.core.queries"),
+    ):
+        r = repeated_query_client.get("/repeated")
+    assert r.status_code == 200
+    assert r.headers["server-timing"].endswith('desc="3 queries"')
+    assert (
+        "Statement run 3 times in GET repeated_repeated_get, possible N+1 query"
+        in caplog.text
+    )
+    assert "Slow query" not in caplog.text
+
+
+def test_repeated_statements_below_threshold(
+    repeated_query_client: TestClient, caplog: pytest.LogCaptureFixture
+) -> None:
+    with (
+        patch("app.core.config.settings.N_PLUS_ONE_THRESHOLD", 4),
+        caplog.at_level(logging.WARNING, logger="app.core.queries"),
+    ):
+        repeated_query_client.get("/repeated")
+    assert "N+1" not in caplog.text
+
+
+def test_slow_queries_logged(
+    repeated_query_client: TestClient, caplog: pytest.LogCaptureFixture
+) -> None:
+    with (
+        patch("app.core.config.settings.SLOW_QUERY_THRESHOLD_MS", 0),
+        caplog.at_level(logging.WARNING, logger="app.core.queries"),
+    ):
+        repeated_query_client.get("/repeated")
+    assert caplog.text.count("Slow query") == 3
+    assert "in GET repeated_repeated_get: SELECT %(i)s" in caplog.text
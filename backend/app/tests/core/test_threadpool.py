@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+import anyio
+from anyio import to_thread
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.config import settings
+from app.core.threadpool import (
+    blocking_threadpool_size,
+    get_blocking_limiter,
+    run_blocking,
+    threadpool_size,
+)
+from app.main import app
+
+
+def test_threadpool_size() -> None:
+    assert threadpool_size() == (
+        settings.POSTGRES_POOL_SIZE + settings.POSTGRES_MAX_OVERFLOW
+    )
+    with patch("app.core.config.settings.THREADPOOL_SIZE", 8):
+        assert threadpool_size() == 8
+    with patch("app.core.config.settings.BLOCKING_THREADPOOL_SIZE", 2):
+        assert blocking_threadpool_size() == 2
+
+
+def test_lifespan_sizes_threadpools() -> None:
+    with (
+        patch("app.core.config.settings.THREADPOOL_SIZE", 12),
+        patch("app.core.config.settings.BLOCKING_THREADPOOL_SIZE", 3),
+        TestClient(app) as client,
+    ):
+        assert client.portal
+        tokens = client.portal.call(
+            lambda: to_thread.current_default_thread_limiter().total_tokens
+        )
+        assert tokens == 12
+        assert get_blocking_limiter().total_tokens == 3
+        assert REGISTRY.get_sample_value("blocking_threadpool_tokens") == 3
+
+
+def test_run_blocking() -> None:
+    async def run() -> tuple[float, float]:
+        default_limiter = to_thread.current_default_thread_limiter()
+        blocking_limiter = get_blocking_limiter()
+        return await run_blocking(
+            lambda: (default_limiter.borrowed_tokens, blocking_limiter.borrowed_tokens)
+        )
+
+    # Not taken from the threads of the routes
+    assert anyio.run(run) == (0, 1)
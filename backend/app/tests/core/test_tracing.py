@@ -0,0 +1,139 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from app.core import tracing
+from app.core.tracing import (
+    RequestRate,
+    before_send_transaction,
+    route_sample_rate,
+    traces_sampler,
+)
+
+ROUTE_RATES = {"/api/v1/items/": 0.5, "/api/v1/items/export": 1.0, "/health": 0.0}
+
+
+def make_transaction(
+    *, name: str = "/api/v1/users/", duration_ms: float = 10, **contexts: Any
+) -> dict[str, Any]:
+    start = datetime.now(timezone.utc)
+    return {
+        "type": "transaction",
+        "transaction": name,
+        "start_timestamp": start,
+        "timestamp": start + timedelta(milliseconds=duration_ms),
+        "contexts": {"trace": {"status": "ok"}, **contexts},
+    }
+
+
+def http_sampling_context(path: str) -> dict[str, Any]:
+    return {
+        "parent_sampled": None,
+        "asgi_scope": {"type": "http", "path": path},
+    }
+
+
+def test_route_sample_rate() -> None:
+    with (
+        patch("app.core.config.settings.SENTRY_TRACES_SAMPLE_RATE", 0.1),
+        patch("app.core.config.settings.SENTRY_TRACES_ROUTE_SAMPLE_RATES", ROUTE_RATES),
+    ):
+        assert route_sample_rate("/api/v1/users/") == 0.1
+        assert route_sample_rate("/api/v1/items/123") == 0.5
+        assert route_sample_rate("/api/v1/items/export") == 1.0
+        assert route_sample_rate("/health") == 0.0
+
+
+def test_request_rate() -> None:
+    rate = RequestRate(window=10)
+    for _ in range(50):
+        rate.hit()
+    assert rate.per_second() == 5
+    rate.window_start -= 15
+    # The previous window only half overlaps with the last 10 seconds
+    assert 2.4 < rate.per_second() <= 2.5
+
+
+def test_traces_sampler() -> None:
+    with (
+        patch("app.core.config.settings.SENTRY_TRACES_ROUTE_SAMPLE_RATES", ROUTE_RATES),
+        patch("app.core.config.settings.SENTRY_TRACES_OUTLIER_RATE", 0.02),
+        patch.object(tracing, "request_rate", RequestRate()),
+    ):
+        assert traces_sampler({"parent_sampled": True}) == 1.0
+        assert traces_sampler({"parent_sampled": False}) == 0.0
+        assert traces_sampler(http_sampling_context("/health")) == 0.0
+        # The route rate and the headroom for outliers, not every request
+        rate = traces_sampler(http_sampling_context("/api/v1/items/"))
+        assert rate == pytest.approx(0.52)
+        assert traces_sampler(http_sampling_context("/api/v1/items/export")) == 1.0
+
+
+def test_traces_sampler_volume_spike() -> None:
+    busy = RequestRate()
+    busy.count = 10_000
+    with (
+        patch("app.core.config.settings.SENTRY_TRACES_MAX_PER_SECOND", 5.0),
+        patch.object(tracing, "request_rate", busy),
+    ):
+        rate = traces_sampler(http_sampling_context("/api/v1/items/"))
+    # Both the sample and the headroom are reduced to the limit
+    assert rate == pytest.approx(2 * 5.0 / (10_001 / busy.window))
+
+
+def test_before_send_transaction_keeps_errors_and_slow_requests() -> None:
+    with patch("app.core.config.settings.SENTRY_TRACES_SAMPLE_RATE", 0.0):
+        error = make_transaction(response={"status_code": 500})
+        assert before_send_transaction(error, {}) is error
+        unhandled = make_transaction(trace={"status": "internal_error"})
+        assert before_send_transaction(unhandled, {}) is unhandled
+        slow = make_transaction(duration_ms=5000)
+        assert before_send_transaction(slow, {}) is slow
+        not_found = make_transaction(response={"status_code": 404})
+        assert before_send_transaction(not_found, {}) is None
+        assert before_send_transaction(make_transaction(), {}) is None
+
+
+def test_sent_at_route_rate() -> None:
+    def trace(name: str, **contexts: Any) -> bool:
+        # Recorded when the request starts, then filtered once finished
+        if random.random() >= traces_sampler(http_sampling_context(name)):
+            return False
+        event = make_transaction(name=name, **contexts)
+        return before_send_transaction(event, {}) is not None
+
+    with (
+        patch("app.core.config.settings.SENTRY_TRACES_ROUTE_SAMPLE_RATES", ROUTE_RATES),
+        patch("app.core.config.settings.SENTRY_TRACES_OUTLIER_RATE", 0.1),
+        patch("app.core.config.settings.SENTRY_TRACES_MAX_PER_SECOND", 10_000),
+        patch.object(tracing, "request_rate", RequestRate()),
+    ):
+        sent = sum(trace("/api/v1/items/") for _ in range(2000))
+        assert 850 < sent < 1150
+        # The errors are sent at the sample rate plus the headroom
+        errors = sum(
+            trace("/api/v1/items/", response={"status_code": 500}) for _ in range(2000)
+        )
+        assert 1050 < errors < 1350
+        assert before_send_transaction(make_transaction(name="/health"), {}) is None
+
+
+def test_before_send_transaction_reduces_rate_on_spikes() -> None:
+    busy = RequestRate()
+    busy.count = 1000
+    with (
+        patch("app.core.config.settings.SENTRY_TRACES_SAMPLE_RATE", 1.0),
+        patch("app.core.config.settings.SENTRY_TRACES_OUTLIER_RATE", 0.05),
+        patch("app.core.config.settings.SENTRY_TRACES_MAX_PER_SECOND", 5.0),
+        patch.object(tracing, "request_rate", busy),
+    ):
+        # 100 requests per second, 5 in the sample and 5 for the outliers
+        # recorded, half of them sent
+        sent = sum(
+            before_send_transaction(make_transaction(), {}) is not None
+            for _ in range(1000)
+        )
+    assert 400 < sent < 600
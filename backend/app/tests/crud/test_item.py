@@ -0,0 +1,91 @@
+import itertools
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+from sqlmodel import Session, select
+
+from app import crud
+from app.crud import items_statement
+from app.models import Item, ItemsFilter
+from app.tests.utils.item import create_random_item
+
+SORTS = ["created_at", "-created_at", "title", "-title"]
+FILTERS: list[dict[str, Any]] = [
+    {},
+    {"title": "report"},
+    {"has_description": True},
+    {"created_after": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+    {"title": "report", "created_before": datetime(2025, 1, 1, tzinfo=timezone.utc)},
+]
+
+
+def plan_nodes(plan: dict[str, Any]) -> list[dict[str, Any]]:
+    return [plan, *itertools.chain(*map(plan_nodes, plan.get("Plans", [])))]
+
+
+# The filters with an index, by the column in their index conditions.
+# has_description isn't indexed, it's checked on the rows read in the order
+# of the sort
+INDEXED_FILTERS = {
+    "title": "title",
+    "created_after": "created_at",
+    "created_before": "created_at",
+}
+
+
+@pytest.mark.parametrize("owner_id", [None, uuid.uuid4()])
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("filters", FILTERS)
+def test_items_statement_uses_index(
+    db: Session, owner_id: uuid.UUID | None, sort: str, filters: dict[str, Any]
+) -> None:
+    statement = items_statement(
+        ItemsFilter(owner_id=owner_id, sort=sort, **filters)
+    ).limit(100)
+    compiled = statement.compile(db.get_bind())
+    connection = db.connection()
+    # Only a sequential scan if no index matches, whatever the table size
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    result = connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params
+    ).scalar_one()
+    db.rollback()
+    nodes = plan_nodes(result[0]["Plan"])
+    scans = [node for node in nodes if "Index Name" in node]
+    assert scans
+    assert "Seq Scan" not in {node["Node Type"] for node in nodes}
+    conditions = " ".join(node.get("Index Cond", "") for node in scans)
+    filtered = {INDEXED_FILTERS[name] for name in filters if name in INDEXED_FILTERS}
+    if owner_id:
+        filtered.add("owner_id")
+    if not any(column in conditions for column in filtered):
+        # Read in the order of the index of the sort, up to the limit
+        sort_column = sort.lstrip("-")
+        assert all(f"_{sort_column}" in node["Index Name"] for node in scans)
+        assert "Sort" not in {node["Node Type"] for node in nodes}
+
+
+def test_title_uses_database_collation(db: Session) -> None:
+    # The titles sort as the users expect, the prefix filters have their own
+    # text_pattern_ops indexes
+    collation = (
+        db.connection()
+        .exec_driver_sql(
+            "SELECT collation_name FROM information_schema.columns "
+            "WHERE table_name = 'item' AND column_name = 'title'"
+        )
+        .scalar_one()
+    )
+    assert collation is None
+
+
+def test_search_vector_not_loaded(db: Session) -> None:
+    # Only the search reads the vector, in the database
+    assert "search_vector" not in str(select(Item))
+    item = create_random_item(db)
+    db.expire_all()
+    found = crud.search_items(session=db, query=item.title, owner_id=item.owner_id)
+    assert [found_item.id for found_item, _ in found] == [item.id]
+    assert "search_vector" not in found[0][0].__dict__
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from fastapi.encoders import jsonable_encoder
 from sqlmodel import Session
 
@@ -16,6 +18,30 @@ def test_create_user(db: Session) -> None:
     assert hasattr(user, "hashed_password")
 
 
+def test_create_users(db: Session) -> None:
+    existing = crud.create_user(
+        session=db,
+        user_create=UserCreate(email=random_email(), password=random_lower_string()),
+    )
+    users_in = [
+        UserCreate(email=random_email(), password=random_lower_string())
+        for _ in range(3)
+    ]
+    repeated = UserCreate(email=users_in[0].email, password=random_lower_string())
+    existing_in = UserCreate(email=existing.email, password=random_lower_string())
+    # Hashed in a pool of processes
+    with patch("app.core.config.settings.PASSWORD_HASH_WORKERS", 2):
+        created, skipped = crud.create_users(
+            session=db,
+            users_create=[*users_in, repeated, existing_in],
+            parallel_hashing=True,
+        )
+    assert [user.email for user in created] == [user.email for user in users_in]
+    assert skipped == [repeated.email, existing.email]
+    for user, user_in in zip(created, users_in, strict=True):
+        assert verify_password(user_in.password, user.hashed_password)
+
+
 def test_authenticate_user(db: Session) -> None:
     email = random_email()
     password = random_lower_string()
@@ -89,3 +115,26 @@ def test_update_user(db: Session) -> None:
     assert user_2
     assert user.email == user_2.email
     assert verify_password(new_password, user_2.hashed_password)
+
+
+def test_search_users_uses_prefix_indexes(db: Session) -> None:
+    email = random_email()
+    crud.create_user(
+        session=db, user_create=UserCreate(email=email, password=random_lower_string())
+    )
+    # "%" and "_" are not wildcards
+    assert crud.search_users(session=db, query="%", limit=10) == []
+    found = crud.search_users(session=db, query=email[:20].upper(), limit=10)
+    assert [user.email for user in found] == [email]
+
+    compiled = crud.users_search_statement("abc", 10).compile(db.get_bind())
+    connection = db.connection()
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params
+    ).scalar_one()
+    db.rollback()
+    # The matches are read in the order of each index, up to the limit
+    assert "ix_user_email_prefix" in str(plan)
+    assert "ix_user_full_name_prefix" in str(plan)
+    assert str(plan).count("'Index Scan'") == 2
@@ -0,0 +1,208 @@
+import threading
+import time
+import uuid
+from collections.abc import Generator
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlmodel import Session, col, func, select, update
+
+from app import crud
+from app.core.db import engine
+from app.email_broadcast import (
+    LeaseRenewer,
+    RateLimiter,
+    claim_broadcast,
+    fetch_recipients,
+    send_broadcast,
+)
+from app.models import (
+    EmailBroadcast,
+    EmailBroadcastCreate,
+    EmailOutbox,
+    User,
+)
+from app.tests.utils.user import create_random_user
+
+
+@pytest.fixture
+def broadcast(db: Session) -> Generator[EmailBroadcast, None, None]:
+    # Only one broadcast at a time is left to claim in these tests
+    db.exec(update(EmailBroadcast).values(status="completed"))  # type: ignore
+    db.commit()
+    for _ in range(3):
+        create_random_user(db)
+    yield crud.create_email_broadcast(
+        session=db,
+        broadcast_in=EmailBroadcastCreate(subject="News", content="<p>New</p>"),
+    )
+
+
+def active_emails(db: Session) -> list[str]:
+    return list(
+        db.exec(select(User.email).where(col(User.is_active)).order_by(User.email))
+    )
+
+
+def test_send_broadcast(db: Session, broadcast: EmailBroadcast) -> None:
+    emails = active_emails(db)
+    failing_email = emails[1]
+
+    def fake_send_email(*, email_to: str, **_kwargs: object) -> bool:
+        return email_to != failing_email
+
+    smtp_backend = MagicMock()
+    with (
+        patch("app.core.config.settings.EMAIL_BROADCAST_CHUNK_SIZE", 2),
+        patch("app.core.config.settings.EMAIL_BROADCAST_RATE_LIMIT", 0),
+        patch("app.email_broadcast.get_smtp_backend", return_value=smtp_backend),
+        patch(
+            "app.email_broadcast.send_email", side_effect=fake_send_email
+        ) as send_email,
+    ):
+        claimed = claim_broadcast(session=db)
+        assert claimed and claimed.id == broadcast.id
+        assert claimed.status == "running"
+        assert claim_broadcast(session=db) is None
+        send_broadcast(session=db, broadcast=claimed, stop_event=threading.Event())
+
+    sent_to = sorted(call.kwargs["email_to"] for call in send_email.call_args_list)
+    assert sent_to == emails
+    html_content = send_email.call_args_list[0].kwargs["html_content"]
+    assert "<p>New</p>" in html_content
+    db.refresh(broadcast)
+    assert broadcast.status == "completed"
+    assert broadcast.total_recipients == len(emails)
+    assert broadcast.sent_count == len(emails) - 1
+    assert broadcast.failed_count == 1
+    assert broadcast.last_email == emails[-1]
+    assert broadcast.locked_until is None
+    # The failed one is retried later by the outbox worker
+    retry = db.exec(
+        select(EmailOutbox)
+        .where(EmailOutbox.email_to == failing_email)
+        .where(EmailOutbox.subject == "News")
+    ).one()
+    assert retry.status == "pending"
+
+
+def test_send_broadcast_resumes_from_checkpoint(
+    db: Session, broadcast: EmailBroadcast
+) -> None:
+    emails = active_emails(db)
+    broadcast.status = "running"
+    broadcast.last_email = emails[1]
+    broadcast.sent_count = 2
+    broadcast.total_recipients = len(emails)
+    db.add(broadcast)
+    db.commit()
+    with (
+        patch("app.core.config.settings.EMAIL_BROADCAST_RATE_LIMIT", 0),
+        patch("app.email_broadcast.get_smtp_backend", return_value=MagicMock()),
+        patch("app.email_broadcast.send_email", return_value=True) as send_email,
+    ):
+        # A crashed worker left it running, with no lease
+        claimed = claim_broadcast(session=db)
+        assert claimed and claimed.id == broadcast.id
+        send_broadcast(session=db, broadcast=claimed, stop_event=threading.Event())
+
+    sent_to = sorted(call.kwargs["email_to"] for call in send_email.call_args_list)
+    assert sent_to == emails[2:]
+    db.refresh(broadcast)
+    assert broadcast.sent_count == len(emails)
+    assert broadcast.status == "completed"
+    total_users = db.exec(select(func.count()).select_from(User)).one()
+    assert broadcast.total_recipients <= total_users
+
+
+def test_fetch_recipients(db: Session) -> None:
+    emails = active_emails(db)
+    with patch("app.core.config.settings.EMAIL_BROADCAST_CHUNK_SIZE", 2):
+        chunk = fetch_recipients(session=db, after=None)
+        assert [recipient.email for recipient in chunk] == emails[:2]
+        # No transaction left open while the chunk is sent
+        assert not db.in_transaction()
+        chunk = fetch_recipients(session=db, after=emails[1])
+        assert [recipient.email for recipient in chunk] == emails[2:4]
+
+
+def test_lease_renewed_while_sending(db: Session, broadcast: EmailBroadcast) -> None:
+    with patch("app.core.config.settings.EMAIL_BROADCAST_LEASE", 60):
+        claimed = claim_broadcast(session=db)
+    assert claimed and claimed.id == broadcast.id
+    assert claimed.locked_until and claimed.lease_owner
+    first_lease = claimed.locked_until
+    # Renewed every 0.1 s, with a lease of 0.3 s
+    with patch("app.core.config.settings.EMAIL_BROADCAST_LEASE", 0.3):
+        with LeaseRenewer(claimed.id, claimed.lease_owner) as renewer:
+            renewer.progress()
+            time.sleep(0.15)
+            db.refresh(claimed)
+            renewed = claimed.locked_until
+            assert renewed and renewed != first_lease
+            # Not renewed while no email is sent
+            time.sleep(0.15)
+            db.refresh(claimed)
+            assert claimed.locked_until == renewed
+        assert not renewer.lost.is_set()
+
+
+def test_lease_not_renewed_for_another_worker(
+    db: Session, broadcast: EmailBroadcast
+) -> None:
+    claimed = claim_broadcast(session=db)
+    assert claimed and claimed.id == broadcast.id
+    lease = claimed.locked_until
+    with patch("app.core.config.settings.EMAIL_BROADCAST_LEASE", 0.3):
+        with LeaseRenewer(claimed.id, uuid.uuid4()) as renewer:
+            renewer.progress()
+            assert renewer.lost.wait(1)
+    db.refresh(claimed)
+    assert claimed.locked_until == lease
+
+
+def test_send_broadcast_taken_over(db: Session, broadcast: EmailBroadcast) -> None:
+    retries_count = select(func.count()).select_from(EmailOutbox)
+    retries_before = db.exec(retries_count).one()
+    claimed = claim_broadcast(session=db)
+    assert claimed and claimed.id == broadcast.id
+    new_owner = uuid.uuid4()
+
+    def fake_send_email(**_kwargs: object) -> bool:
+        # Another worker took the lease over while the chunk was sent
+        with Session(engine) as session:
+            session.exec(
+                update(EmailBroadcast)  # type: ignore
+                .where(col(EmailBroadcast.id) == broadcast.id)
+                .values(lease_owner=new_owner)
+            )
+            session.commit()
+        return False
+
+    with (
+        patch("app.core.config.settings.EMAIL_BROADCAST_CHUNK_SIZE", 2),
+        patch("app.core.config.settings.EMAIL_BROADCAST_RATE_LIMIT", 0),
+        patch("app.email_broadcast.get_smtp_backend", return_value=MagicMock()),
+        patch(
+            "app.email_broadcast.send_email", side_effect=fake_send_email
+        ) as send_email,
+    ):
+        send_broadcast(session=db, broadcast=claimed, stop_event=threading.Event())
+
+    # Stopped after the first chunk, with neither its progress nor its
+    # failed emails saved
+    assert send_email.call_count == 2
+    db.refresh(broadcast)
+    assert broadcast.status == "running"
+    assert broadcast.lease_owner == new_owner
+    assert broadcast.last_email is None
+    assert broadcast.failed_count == 0
+    assert db.exec(retries_count).one() == retries_before
+
+
+def test_rate_limiter() -> None:
+    limiter = RateLimiter(100)
+    start = time.monotonic()
+    for _ in range(11):
+        limiter.wait()
+    assert time.monotonic() - start >= 0.1
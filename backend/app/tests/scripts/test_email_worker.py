@@ -0,0 +1,118 @@
+import signal
+import threading
+from collections.abc import Callable
+from datetime import timedelta
+from types import FrameType
+from unittest.mock import MagicMock, patch
+
+from sqlmodel import Session, select
+
+from app import crud
+from app.email_worker import main, process_outbox_batch, retry_delay
+from app.models import EmailOutbox, utc_now
+from app.tests.utils.utils import random_email
+
+
+def process_all(db: Session) -> None:
+    while process_outbox_batch(session=db):
+        pass
+
+
+def test_process_outbox_batch_reuses_connection(db: Session) -> None:
+    emails_to = [random_email() for _ in range(3)]
+    for email_to in emails_to:
+        crud.enqueue_email(
+            session=db, email_to=email_to, subject="Hi", html_content="<p>Hi</p>"
+        )
+    smtp_backend = MagicMock()
+    with (
+        patch("app.email_worker.get_smtp_backend", return_value=smtp_backend),
+        patch("app.email_worker.send_email", return_value=True) as send_email,
+    ):
+        process_all(db)
+    # One connection for the whole batch
+    smtp_backend.__enter__.assert_called_once()
+    sent_to = {call.kwargs["email_to"] for call in send_email.call_args_list}
+    assert set(emails_to) <= sent_to
+    for call in send_email.call_args_list:
+        assert call.kwargs["smtp"] is smtp_backend.__enter__.return_value
+    for email_to in emails_to:
+        email = db.exec(
+            select(EmailOutbox).where(EmailOutbox.email_to == email_to)
+        ).one()
+        assert email.status == "sent"
+        assert email.sent_at is not None
+        assert email.attempts == 1
+
+
+def test_process_outbox_batch_retries_with_backoff(db: Session) -> None:
+    email = crud.enqueue_email(
+        session=db, email_to=random_email(), subject="Hi", html_content="<p>Hi</p>"
+    )
+    with (
+        patch("app.email_worker.get_smtp_backend", return_value=MagicMock()),
+        patch("app.email_worker.send_email", return_value=False),
+    ):
+        process_all(db)
+    db.refresh(email)
+    assert email.status == "pending"
+    assert email.attempts == 1
+    assert email.last_error
+    assert email.next_attempt_at > utc_now()
+
+    # Not due yet, so it's not retried
+    with patch("app.email_worker.send_email", return_value=True) as send_email:
+        process_all(db)
+    assert not any(
+        call.kwargs["email_to"] == email.email_to for call in send_email.call_args_list
+    )
+
+
+def test_process_outbox_batch_gives_up(db: Session) -> None:
+    email = crud.enqueue_email(
+        session=db, email_to=random_email(), subject="Hi", html_content="<p>Hi</p>"
+    )
+    with (
+        patch("app.core.config.settings.EMAIL_OUTBOX_MAX_ATTEMPTS", 1),
+        patch("app.email_worker.get_smtp_backend", return_value=MagicMock()),
+        patch("app.email_worker.send_email", side_effect=OSError("refused")),
+    ):
+        process_all(db)
+    db.refresh(email)
+    assert email.status == "failed"
+    assert email.last_error == "refused"
+
+
+def test_retry_delay() -> None:
+    with (
+        patch("app.core.config.settings.EMAIL_OUTBOX_RETRY_DELAY", 10),
+        patch("app.core.config.settings.EMAIL_OUTBOX_MAX_RETRY_DELAY", 60),
+    ):
+        assert timedelta(seconds=8) <= retry_delay(1) <= timedelta(seconds=12)
+        assert timedelta(seconds=32) <= retry_delay(3) <= timedelta(seconds=48)
+        assert retry_delay(10) <= timedelta(seconds=72)
+
+
+def test_main_idles_without_smtp() -> None:
+    handlers: dict[int, Callable[[int, FrameType | None], None]] = {}
+
+    def set_handler(
+        signum: int, handler: Callable[[int, FrameType | None], None]
+    ) -> None:
+        handlers[signum] = handler
+
+    with (
+        patch("app.core.config.settings.SMTP_HOST", None),
+        patch("app.email_worker.setup_logging"),
+        patch("app.email_worker.signal.signal", side_effect=set_handler),
+        patch("app.email_worker.run") as run,
+    ):
+        worker = threading.Thread(target=main)
+        worker.start()
+        # Waiting for a signal rather than exiting, to be restarted
+        worker.join(0.1)
+        assert worker.is_alive()
+        handlers[signal.SIGTERM](signal.SIGTERM, None)
+        worker.join(1)
+    assert not worker.is_alive()
+    run.assert_not_called()
@@ -0,0 +1,56 @@
+from unittest.mock import patch
+
+from sqlmodel import Session, col, delete, func, select
+
+from app.core.security import verify_password
+from app.generate_data import (
+    EMAIL_PREFIX,
+    generate,
+    item_rows,
+    password_hashes,
+    user_rows,
+)
+from app.models import Item, User
+
+
+def test_rows_are_deterministic() -> None:
+    hashes = ["hash-0", "hash-1"]
+    assert list(user_rows(1, 0, 10, hashes)) == list(user_rows(1, 0, 10, hashes))
+    assert list(user_rows(1, 0, 10, hashes)) != list(user_rows(2, 0, 10, hashes))
+    assert list(item_rows(1, 0, 10, 5, 2.0)) == list(item_rows(1, 0, 10, 5, 2.0))
+
+
+def test_items_owned_by_generated_users() -> None:
+    user_ids = {row[0] for row in user_rows(0, 0, 20, ["hash"])}
+    owners = [row[3] for row in item_rows(0, 0, 2000, 20, 2.0)]
+    assert set(owners) <= user_ids
+    # Skewed, the first users own more items
+    first_user = next(iter(user_rows(0, 0, 1, ["hash"])))[0]
+    assert owners.count(first_user) > 2000 / 20
+
+
+def test_password_hashes() -> None:
+    hashes = password_hashes(seed=0, count=2)
+    assert hashes == password_hashes(seed=0, count=2)
+    assert verify_password("password-1", hashes[1])
+
+
+def test_generate(db: Session) -> None:
+    with patch("app.generate_data.chunk_size", 30):
+        generate(users=50, items=200, workers=2, passwords=2)
+    try:
+        users = db.exec(
+            select(func.count())
+            .select_from(User)
+            .where(col(User.email).startswith(EMAIL_PREFIX))
+        ).one()
+        items = db.exec(
+            select(func.count())
+            .select_from(Item)
+            .join(User)
+            .where(col(User.email).startswith(EMAIL_PREFIX))
+        ).one()
+        assert (users, items) == (50, 200)
+    finally:
+        db.execute(delete(User).where(col(User.email).startswith(EMAIL_PREFIX)))
+        db.commit()
@@ -0,0 +1,130 @@
+import io
+import json
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from sqlmodel import Session, func, select
+
+from app import import_items as importer
+from app.import_items import import_items, read_records
+from app.models import Item, ItemImportRow
+from app.tests.utils.user import create_random_user
+
+
+def write_ndjson(path: Path, records: list[dict[str, Any]]) -> Path:
+    path.write_text("".join(f"{json.dumps(record)}\n" for record in records))
+    return path
+
+
+def test_read_records_offsets(tmp_path: Path) -> None:
+    path = tmp_path / "items.csv"
+    path.write_text(
+        'title,description,owner_email\nA,"two\nlines",a@example.com\nB,,b@example.com\n'
+    )
+    records = list(read_records(path, file_format="csv"))
+    rows = [record for record, _ in records if isinstance(record, dict)]
+    assert [row["title"] for row in rows] == ["A", "B"]
+    assert rows[0]["description"] == "two\nlines"
+    assert records[-1][1] == path.stat().st_size
+    # Resuming from the offset after the first record
+    resumed = list(read_records(path, file_format="csv", offset=records[0][1]))
+    assert resumed == records[1:]
+
+
+def test_read_records_invalid_lines(tmp_path: Path) -> None:
+    path = tmp_path / "items.ndjson"
+    path.write_text('{"title": "A"}\n{"title": \n\n[1, 2]\n{"title": "B"}\n')
+    records = list(read_records(path, file_format="ndjson"))
+    assert [record for record, _ in records] == [
+        {"title": "A"},
+        "Line 2: invalid JSON: Expecting value: line 2 column 1 (char 11)",
+        "Line 4: not a JSON object",
+        {"title": "B"},
+    ]
+    # Still numbered from the start of the file when resuming
+    resumed = list(read_records(path, file_format="ndjson", offset=records[0][1]))
+    assert resumed == records[1:]
+
+
+def test_import_items(db: Session, tmp_path: Path) -> None:
+    user = create_random_user(db)
+    path = write_ndjson(
+        tmp_path / "items.ndjson",
+        [
+            {"title": "Imported 1", "description": "d", "owner_email": user.email},
+            {"title": "Imported 2", "owner_email": user.email},
+            {"title": "", "owner_email": user.email},
+            {"title": "No owner"},
+            {"title": "Unknown owner", "owner_email": "nobody@example.com"},
+        ],
+    )
+    with path.open("a") as file:
+        file.write('{"title": "Truncated\n"Not an object"\n')
+    rejects = io.StringIO()
+    item_import = import_items(
+        path, file_format="ndjson", batch_size=2, rejects=rejects
+    )
+    assert item_import.status == "completed"
+    assert item_import.rows_staged == 2
+    assert item_import.rows_rejected == 5
+    assert item_import.rows_imported == 2
+    assert item_import.offset == path.stat().st_size
+    assert len(rejects.getvalue().splitlines()) == 5
+    assert "unknown owner nobody@example.com" in rejects.getvalue()
+    assert "Line 6: invalid JSON" in rejects.getvalue()
+    assert "Line 7: not a JSON object" in rejects.getvalue()
+    titles = db.exec(select(Item.title).where(Item.owner_id == user.id)).all()
+    assert sorted(titles) == ["Imported 1", "Imported 2"]
+    staged = db.exec(
+        select(func.count())
+        .select_from(ItemImportRow)
+        .where(ItemImportRow.import_id == item_import.id)
+    ).one()
+    assert staged == 0
+
+
+def test_import_items_csv_from_excel(db: Session, tmp_path: Path) -> None:
+    user = create_random_user(db)
+    path = tmp_path / "items.csv"
+    # Saved as UTF-8 by Excel, with a byte order mark
+    path.write_text(
+        f"title,description,owner_email\nCafé,,{user.email}\n", encoding="utf-8-sig"
+    )
+    item_import = import_items(
+        path, file_format="csv", batch_size=10, rejects=io.StringIO()
+    )
+    assert item_import.rows_imported == 1
+    item = db.exec(select(Item).where(Item.owner_id == user.id)).one()
+    assert item.title == "Café"
+    assert item.description is None
+
+
+def test_import_items_resumes(db: Session, tmp_path: Path) -> None:
+    user = create_random_user(db)
+    path = write_ndjson(
+        tmp_path / "resume.ndjson",
+        [{"title": f"Item {i}", "owner_email": user.email} for i in range(5)],
+    )
+    stage_rows = importer.stage_rows
+    calls = 0
+
+    def fail_on_second_batch(**kwargs: Any) -> None:
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("Interrupted")
+        stage_rows(**kwargs)
+
+    with (
+        patch("app.import_items.stage_rows", fail_on_second_batch),
+        pytest.raises(RuntimeError),
+    ):
+        import_items(path, file_format="ndjson", batch_size=2)
+    assert db.exec(select(Item).where(Item.owner_id == user.id)).all() == []
+
+    item_import = import_items(path, file_format="ndjson", batch_size=2)
+    assert item_import.rows_staged == 5
+    titles = db.exec(select(Item.title).where(Item.owner_id == user.id)).all()
+    assert sorted(titles) == [f"Item {i}" for i in range(5)]
@@ -0,0 +1,18 @@
+import os
+
+from app.import_time import measure_import_time
+
+# Generous default so that slow CI machines don't flake, lower it locally with
+# IMPORT_TIME_BUDGET_MS to catch smaller regressions
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "3000"))
+
+
+def test_lazy_modules_not_imported_at_startup() -> None:
+    report = measure_import_time("app.main")
+    assert report.loaded_lazy_modules == []
+
+
+def test_import_time_budget() -> None:
+    # Keep the best of a few runs, the first one may also write bytecode caches
+    total_ms = min(measure_import_time("app.main").total_ms for _ in range(3))
+    assert 0 < total_ms < IMPORT_TIME_BUDGET_MS
@@ -0,0 +1,47 @@
+import io
+from pathlib import Path
+
+from sqlmodel import Session, col, select
+
+from app.import_users import import_users
+from app.models import EmailOutbox, User
+from app.tests.utils.utils import random_email, random_lower_string
+
+
+def test_import_users(db: Session, tmp_path: Path) -> None:
+    emails = [random_email() for _ in range(3)]
+    path = tmp_path / "users.csv"
+    path.write_text(
+        "email,password,full_name,is_superuser\n"
+        f"{emails[0]},{random_lower_string()},Ada Lovelace,\n"
+        f"{emails[1]},{random_lower_string()},,false\n"
+        f"{emails[2]},short,,\n"
+        f"{emails[0]},{random_lower_string()},,\n"
+    )
+    skipped = io.StringIO()
+    counts = import_users(
+        path, file_format="csv", batch_size=2, send_emails=True, skipped=skipped
+    )
+    assert counts == (2, 1, 1)
+    assert skipped.getvalue() == f"{emails[0]}\n"
+    users = db.exec(
+        select(User).where(col(User.email).in_(emails)).order_by(col(User.email))
+    ).all()
+    assert sorted(user.email for user in users) == sorted(emails[:2])
+    assert {user.full_name for user in users} == {"Ada Lovelace", None}
+    queued = db.exec(
+        select(EmailOutbox.email_to).where(col(EmailOutbox.email_to).in_(emails))
+    ).all()
+    assert sorted(queued) == sorted(emails[:2])
+
+
+def test_import_users_invalid_lines(db: Session, tmp_path: Path) -> None:
+    email = random_email()
+    path = tmp_path / "users.ndjson"
+    path.write_text(
+        '{"email": \n'
+        "[]\n"
+        f'{{"email": "{email}", "password": "{random_lower_string()}"}}\n'
+    )
+    assert import_users(path, file_format="ndjson") == (1, 0, 2)
+    assert db.exec(select(User).where(User.email == email)).first()
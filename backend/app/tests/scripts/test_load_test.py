@@ -0,0 +1,137 @@
+import asyncio
+
+import httpx
+from sqlmodel import Session, col, func, select
+
+from app.benchmarks.load_test import (
+    EMAIL_PREFIX,
+    LoadTestResult,
+    OperationStats,
+    clean_dataset,
+    compare_to_baseline,
+    percentile,
+    run_load_test,
+    seed_dataset,
+)
+from app.main import app
+from app.models import Item, User
+
+
+def test_seed_and_run_load_test(db: Session) -> None:
+    emails = seed_dataset(session=db, users=2, items_per_user=3)
+    # Seeding again doesn't create duplicates
+    assert seed_dataset(session=db, users=2, items_per_user=3) == emails
+    items = db.exec(
+        select(func.count())
+        .select_from(Item)
+        .join(User)
+        .where(col(User.email).in_(emails))
+    ).one()
+    assert items == 6
+
+    async def run(users_share: float) -> LoadTestResult:
+        async with (
+            app.router.lifespan_context(app),
+            httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://test"
+            ) as client,
+        ):
+            return await run_load_test(
+                client,
+                emails=emails,
+                concurrency=2,
+                duration=0.2,
+                users_share=users_share,
+            )
+
+    try:
+        items_result = asyncio.run(run(users_share=0))
+        users_result = asyncio.run(run(users_share=1))
+    finally:
+        clean_dataset(session=db)
+    operations = {stats.operation: stats for stats in items_result.operations}
+    assert operations.keys() == {
+        "login",
+        "items-list",
+        "items-create",
+        "items-read",
+        "items-update",
+        "items-delete",
+    }
+    assert operations["items-list"].p50_ms <= operations["items-list"].p99_ms
+    assert {stats.operation for stats in users_result.operations} == {
+        "login",
+        "users-list",
+        "users-create",
+        "users-read",
+        "users-delete",
+    }
+    for stats in items_result.operations + users_result.operations:
+        assert stats.errors == 0
+    leftover = db.exec(
+        select(func.count())
+        .select_from(User)
+        .where(col(User.email).startswith(EMAIL_PREFIX))
+    ).one()
+    assert leftover == 0
+
+
+def test_load_test_survives_transport_errors() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/login/access-token"):
+            return httpx.Response(200, json={"access_token": "token"})
+        raise httpx.ReadTimeout("Timed out", request=request)
+
+    async def run() -> LoadTestResult:
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), base_url="http://test"
+        ) as client:
+            return await run_load_test(
+                client,
+                emails=["user@example.com"],
+                concurrency=2,
+                duration=0.3,
+                users_share=1,
+            )
+
+    result = asyncio.run(run())
+    operations = {stats.operation: stats for stats in result.operations}
+    # Every API request timed out, and the run still went on to the end
+    assert operations["users-list"].errors == operations["users-list"].count > 0
+    assert operations["users-create"].errors == operations["users-create"].count
+
+
+def test_percentile() -> None:
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 99) == 3
+
+
+def make_result(p95_ms: float, rps: float) -> LoadTestResult:
+    stats = OperationStats(
+        operation="items-list",
+        count=100,
+        errors=0,
+        rps=rps,
+        p50_ms=p95_ms / 2,
+        p95_ms=p95_ms,
+        p99_ms=p95_ms * 2,
+    )
+    return LoadTestResult(duration=10, concurrency=1, operations=[stats])
+
+
+def test_compare_to_baseline() -> None:
+    baseline = make_result(p95_ms=10, rps=100)
+    assert (
+        compare_to_baseline(make_result(p95_ms=11, rps=95), baseline, max_regression=20)
+        == []
+    )
+    regressions = compare_to_baseline(
+        make_result(p95_ms=15, rps=50), baseline, max_regression=20
+    )
+    assert regressions == [
+        "items-list: p95 10.0 ms -> 15.0 ms",
+        "items-list: 100.0 -> 50.0 requests/s",
+    ]
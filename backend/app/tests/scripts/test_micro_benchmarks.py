@@ -0,0 +1,81 @@
+from sqlmodel import Session, col, func, select
+
+from app.benchmarks import load_test
+from app.benchmarks.micro import (
+    EMAIL_PREFIX,
+    Benchmark,
+    BenchmarkResult,
+    benchmarks,
+    compare_to_baseline,
+    measure,
+)
+from app.core.db import engine
+from app.models import User
+
+
+def test_measure() -> None:
+    result = measure(Benchmark("list", lambda: list(range(1000)), number=10), repeat=2)
+    assert result.calls == 20
+    assert 0 < result.best_us <= result.median_us
+    # 1000 pointers in the list at least
+    assert result.peak_kib > 7
+    assert result.retained_kib < 1
+
+
+def test_benchmarks_run_and_clean_up(db: Session) -> None:
+    with Session(engine) as session:
+        load_test.seed_dataset(session=session, users=1, items_per_user=0)
+    with Session(engine) as session, benchmarks(session) as all_benchmarks:
+        names = [benchmark.name for benchmark in all_benchmarks]
+        for benchmark in all_benchmarks:
+            benchmark.number = 1
+            measure(benchmark, repeat=1)
+    assert names == [
+        "create_user",
+        "authenticate",
+        "create_item",
+        "get_user_by_email",
+        "create_access_token",
+        "decode_access_token",
+        "get_current_user",
+        "render_email_template",
+    ]
+    leftover = db.exec(
+        select(func.count())
+        .select_from(User)
+        .where(col(User.email).startswith(EMAIL_PREFIX))
+    ).one()
+    assert leftover == 0
+    # The dataset of the load test is left alone
+    assert db.exec(
+        select(User).where(User.email == load_test.bench_email("user-0"))
+    ).first()
+    with Session(engine) as session:
+        load_test.clean_dataset(session=session)
+
+
+def make_result(best_us: float, peak_kib: float) -> BenchmarkResult:
+    return BenchmarkResult(
+        name="create_item",
+        calls=100,
+        best_us=best_us,
+        median_us=best_us,
+        peak_kib=peak_kib,
+        retained_kib=0,
+    )
+
+
+def test_compare_to_baseline() -> None:
+    baseline = [make_result(best_us=100, peak_kib=10)]
+    assert (
+        compare_to_baseline(
+            [make_result(best_us=110, peak_kib=11)], baseline, max_regression=20
+        )
+        == []
+    )
+    assert compare_to_baseline(
+        [make_result(best_us=150, peak_kib=20)], baseline, max_regression=20
+    ) == [
+        "create_item: 100.0 µs -> 150.0 µs",
+        "create_item: 10.0 KiB -> 20.0 KiB peak",
+    ]
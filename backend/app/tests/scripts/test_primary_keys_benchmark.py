@@ -0,0 +1,16 @@
+from sqlalchemy import inspect
+
+from app.benchmarks.primary_keys import run_benchmark
+from app.core.db import engine
+
+
+def test_run_benchmark() -> None:
+    results = run_benchmark(rows=500, batch_size=100)
+    assert [result.name for result in results] == ["uuid4", "uuid7"]
+    assert all(result.rows_per_second > 0 for result in results)
+    assert all(result.index_kib > 0 for result in results)
+    assert not [
+        table
+        for table in inspect(engine).get_table_names()
+        if table.startswith("bench_primary_key")
+    ]
@@ -0,0 +1,29 @@
+import os
+from unittest.mock import patch
+
+from app.server import default_worker_count, read_rss_mb
+
+
+def test_default_worker_count_limited_by_memory() -> None:
+    with (
+        patch("app.server.available_cpus", return_value=8),
+        patch("app.server.available_memory_mb", return_value=2048),
+    ):
+        assert default_worker_count(max_rss_mb=512) == 4
+        assert default_worker_count(max_rss_mb=4096) == 1
+        assert default_worker_count(max_rss_mb=None) == 8
+
+
+def test_default_worker_count_unknown_memory() -> None:
+    with (
+        patch("app.server.available_cpus", return_value=2),
+        patch("app.server.available_memory_mb", return_value=None),
+    ):
+        assert default_worker_count(max_rss_mb=512) == 2
+
+
+def test_read_rss_mb() -> None:
+    rss_mb = read_rss_mb(os.getpid())
+    if os.path.exists("/proc"):
+        assert rss_mb is not None and rss_mb > 0
+    assert read_rss_mb(-1) is None
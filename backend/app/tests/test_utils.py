@@ -0,0 +1,31 @@
+from jinja2 import Template
+
+from app.utils import (
+    EMAIL_TEMPLATES_DIR,
+    generate_reset_password_email,
+    get_email_templates_env,
+    precompile_email_templates,
+    render_email_template,
+)
+
+
+def test_render_email_template_matches_uncompiled() -> None:
+    context = {"project_name": "Project", "email": "user@example.com"}
+    template_str = (EMAIL_TEMPLATES_DIR / "test_email.html").read_text()
+    expected = Template(template_str).render(context)
+    assert render_email_template(template_name="test_email.html", context=context) == (
+        expected
+    )
+
+
+def test_email_templates_compiled_once() -> None:
+    precompile_email_templates()
+    env = get_email_templates_env()
+    template = env.get_template("reset_password.html")
+    generate_reset_password_email(
+        email_to="user@example.com", email="user@example.com", token="token"
+    )
+    assert env.get_template("reset_password.html") is template
+    assert set(env.list_templates()) == {
+        path.name for path in EMAIL_TEMPLATES_DIR.glob("*.html")
+    }
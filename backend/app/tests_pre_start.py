@@ -5,8 +5,8 @@ from sqlmodel import Session, select
 from tenacity import after_log, before_log, retry, stop_after_attempt, wait_fixed
 
 from app.core.db import engine
+from app.core.logs import setup_logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 max_tries = 60 * 5  # 5 minutes
@@ -30,6 +30,7 @@ def init(db_engine: Engine) -> None:
 
 
 def main() -> None:
+    setup_logging()
     logger.info("Initializing service")
     init(engine)
     logger.info("Service finished initializing")
@@ -1,18 +1,22 @@
 import logging
+from collections.abc import Iterable
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import emails  # type: ignore
 import jwt
-from jinja2 import Template
 from jwt.exceptions import InvalidTokenError
 
 from app.core import security
 from app.core.config import settings
 
-logging.basicConfig(level=logging.INFO)
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+    from app.models import UserCreate
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,37 +26,84 @@ class EmailData:
     subject: str
 
 
+EMAIL_TEMPLATES_DIR = Path(__file__).parent / "email-templates" / "build"
+
+
+@lru_cache
+def get_email_templates_env() -> "Environment":
+    """
+    Jinja environment shared by all the email renders, keeping the compiled
+    templates in memory and their bytecode on disk for the next processes.
+    """
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+    bytecode_dir = settings.EMAIL_TEMPLATES_BYTECODE_CACHE_DIR
+    if bytecode_dir:
+        Path(bytecode_dir).mkdir(parents=True, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(EMAIL_TEMPLATES_DIR),
+        bytecode_cache=FileSystemBytecodeCache(bytecode_dir),
+        cache_size=settings.EMAIL_TEMPLATES_CACHE_SIZE,
+        auto_reload=settings.EMAIL_TEMPLATES_AUTO_RELOAD,
+    )
+
+
+def precompile_email_templates() -> None:
+    env = get_email_templates_env()
+    for template_name in env.list_templates(extensions=["html"]):
+        env.get_template(template_name)
+
+
 def render_email_template(*, template_name: str, context: dict[str, Any]) -> str:
-    template_str = (
-        Path(__file__).parent / "email-templates" / "build" / template_name
-    ).read_text()
-    html_content = Template(template_str).render(context)
+    template = get_email_templates_env().get_template(template_name)
+    html_content = template.render(context)
     return html_content
 
 
+def get_smtp_options() -> dict[str, Any]:
+    smtp_options: dict[str, Any] = {
+        "host": settings.SMTP_HOST,
+        "port": settings.SMTP_PORT,
+    }
+    if settings.SMTP_TLS:
+        smtp_options["tls"] = True
+    elif settings.SMTP_SSL:
+        smtp_options["ssl"] = True
+    if settings.SMTP_USER:
+        smtp_options["user"] = settings.SMTP_USER
+    if settings.SMTP_PASSWORD:
+        smtp_options["password"] = settings.SMTP_PASSWORD
+    return smtp_options
+
+
+def get_smtp_backend() -> Any:
+    """
+    SMTP backend keeping its connection open, to send several emails through
+    it. Use it as a context manager to close the connection at the end.
+    """
+    from emails.backend import SMTPBackend  # type: ignore
+
+    return SMTPBackend(**get_smtp_options())
+
+
 def send_email(
     *,
     email_to: str,
     subject: str = "",
     html_content: str = "",
-) -> None:
+    smtp: Any = None,
+) -> bool:
     assert settings.emails_enabled, "no provided configuration for email variables"
+    import emails  # type: ignore
+
     message = emails.Message(
         subject=subject,
         html=html_content,
         mail_from=(settings.EMAILS_FROM_NAME, settings.EMAILS_FROM_EMAIL),
     )
-    smtp_options = {"host": settings.SMTP_HOST, "port": settings.SMTP_PORT}
-    if settings.SMTP_TLS:
-        smtp_options["tls"] = True
-    elif settings.SMTP_SSL:
-        smtp_options["ssl"] = True
-    if settings.SMTP_USER:
-        smtp_options["user"] = settings.SMTP_USER
-    if settings.SMTP_PASSWORD:
-        smtp_options["password"] = settings.SMTP_PASSWORD
-    response = message.send(to=email_to, smtp=smtp_options)
+    response = message.send(to=email_to, smtp=smtp or get_smtp_options())
     logger.info(f"send email result: {response}")
+    return bool(response.success)
 
 
 def generate_test_email(email_to: str) -> EmailData:
@@ -100,6 +151,23 @@ def generate_new_account_email(
     return EmailData(html_content=html_content, subject=subject)
 
 
+def generate_new_account_emails(
+    users_create: list["UserCreate"], emails: Iterable[str]
+) -> dict[str, EmailData]:
+    """
+    The new account emails of the users created, among those imported.
+    """
+    passwords: dict[str, str] = {}
+    for user_create in users_create:
+        passwords.setdefault(user_create.email, user_create.password)
+    return {
+        email: generate_new_account_email(
+            email_to=email, username=email, password=passwords[email]
+        )
+        for email in emails
+    }
+
+
 def generate_password_reset_token(email: str) -> str:
     delta = timedelta(hours=settings.EMAIL_RESET_TOKEN_EXPIRE_HOURS)
     now = datetime.now(timezone.utc)